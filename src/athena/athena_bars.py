@@ -0,0 +1,61 @@
+import logging
+from src.athena.query_executor import QueryExecutor
+
+
+class AthenaBars:
+    """Athena table over the OHLCV bars written by LambdaConsume"""
+
+    def __init__(self, athena_client, s3_staging, s3_bucket_name, athena_db, project_name,
+                 intervals, partition_start_date="2025-01-01", query_executor=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.s3_bucket_name = s3_bucket_name
+        self.athena_db = athena_db
+        self.project_name = project_name
+        self.intervals = intervals
+        self.partition_start_date = partition_start_date
+        self.query_executor = query_executor or QueryExecutor(
+            athena_client, s3_staging)
+
+    def bars_table_query(self):
+        location = f"s3://{self.s3_bucket_name}/{self.project_name}_bars"
+        return f"""
+            CREATE EXTERNAL TABLE IF NOT EXISTS ticker_bars (
+                symbol STRING,
+                bar_start TIMESTAMP,
+                bar_end TIMESTAMP,
+                open DOUBLE,
+                high DOUBLE,
+                low DOUBLE,
+                close DOUBLE,
+                sampled_volume DOUBLE,
+                sampled_vwap DOUBLE,
+                trade_count BIGINT,
+                event_count BIGINT
+            )
+            PARTITIONED BY (bar_interval STRING, dt STRING)
+            STORED AS PARQUET
+            LOCATION '{location}/'
+            TBLPROPERTIES (
+                'projection.enabled' = 'true',
+                'projection.bar_interval.type' = 'enum',
+                'projection.bar_interval.values' = '{",".join(self.intervals)}',
+                'projection.dt.type' = 'date',
+                'projection.dt.format' = 'yyyy-MM-dd',
+                'projection.dt.range' = '{self.partition_start_date},NOW',
+                'projection.dt.interval' = '1',
+                'projection.dt.interval.unit' = 'DAYS',
+                'storage.location.template' = '{location}/bar_interval=${{bar_interval}}/dt=${{dt}}/'
+            )
+            """
+
+    def create_bars_table(self):
+        if self.query_executor.run_query(self.bars_table_query(), self.athena_db):
+            self.logger.info("✅ Bars table created successfully")
+        else:
+            self.logger.error("❌ Failed to create bars table")
+
+    def stages(self):
+        return [[("ticker_bars table", self.bars_table_query(), self.athena_db)]]
+
+    def run(self):
+        return self.query_executor.run_stages(self.stages())
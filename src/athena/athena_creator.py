@@ -1,8 +1,11 @@
+from src.aws_clients import get_client
 from src.athena.athena_ticker import AthenaTicker
+from src.athena.athena_bars import AthenaBars
+from src.athena.athena_streams import AthenaStreams
+from src.athena.query_executor import QueryExecutor
+from src.transfom.event_types import event_types_for, parse_stream_types
 from dotenv import load_dotenv
 import os
-import boto3
-import time
 import logging
 load_dotenv()
 
@@ -21,57 +24,98 @@ class AthenaCreator:
         self.S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
         self.ATHENA_MINI_DB = os.getenv("ATHENA_MINI_DB")
         self.S3_STAGING_DIR = os.getenv("S3_STAGING_DIR")
-        self.STREAM_TYPES = os.getenv("STREAM_TYPES")
+        self.STREAM_TYPES = parse_stream_types(
+            os.getenv("STREAM_TYPES"), os.getenv("STREAM_TYPE") or "ticker")
         self.PROJECT_NAME = os.getenv("PROJECT_NAME")
+        self.PARTITION_LAYOUT = [
+            name.strip() for name in os.getenv("PARTITION_LAYOUT", "dt,hour").split(",")
+            if name.strip()
+        ]
+        self.PARTITION_START_DATE = os.getenv(
+            "PARTITION_START_DATE", "2025-01-01")
+        self.VIEW_LOOKBACK_DAYS = int(os.getenv("VIEW_LOOKBACK_DAYS", 1))
+        # Static values of the symbol partition. The TOPCOIN list changes while
+        # streaming, so without this list the partition is injected instead.
+        self.PARTITION_SYMBOLS = [
+            symbol.strip() for symbol in os.getenv("PARTITION_SYMBOLS", "").split(",")
+            if symbol.strip()
+        ]
 
-        self.athena_client = boto3.client(
+        self.SNAPSHOT_INTERVAL = int(os.getenv("SNAPSHOT_INTERVAL", 30))
+        self.BAR_INTERVALS = [
+            name.strip() for name in os.getenv("BAR_INTERVALS", "1m,5m,1h").split(",")
+            if name.strip()
+        ]
+        self.ATHENA_MAX_CONCURRENCY = int(
+            os.getenv("ATHENA_MAX_CONCURRENCY", 8))
+        self.ATHENA_CACHE_TTL = int(os.getenv("ATHENA_CACHE_TTL", 300))
+
+        self.athena_client = get_client(
             "athena",
             region_name=self.AWS_REGION
         )
+        # Shared by every Athena component
+        self.query_executor = QueryExecutor(
+            self.athena_client,
+            self.S3_STAGING_DIR,
+            max_workers=self.ATHENA_MAX_CONCURRENCY,
+            cache_ttl=self.ATHENA_CACHE_TTL,
+        )
 
         self.athena_ticker = AthenaTicker(
-            self.athena_client, self.S3_STAGING_DIR, self.S3_BUCKET_NAME, self.ATHENA_MINI_DB, self.PROJECT_NAME
+            self.athena_client, self.S3_STAGING_DIR, self.S3_BUCKET_NAME, self.ATHENA_MINI_DB, self.PROJECT_NAME,
+            partition_layout=self.PARTITION_LAYOUT,
+            symbols=self.PARTITION_SYMBOLS,
+            partition_start_date=self.PARTITION_START_DATE,
+            view_lookback_days=self.VIEW_LOOKBACK_DAYS,
+            query_executor=self.query_executor,
+            snapshot_enabled=self.SNAPSHOT_INTERVAL > 0,
         )
+        self.athena_bars = None
+        if self.BAR_INTERVALS:
+            self.athena_bars = AthenaBars(
+                self.athena_client, self.S3_STAGING_DIR, self.S3_BUCKET_NAME, self.ATHENA_MINI_DB, self.PROJECT_NAME,
+                self.BAR_INTERVALS,
+                partition_start_date=self.PARTITION_START_DATE,
+                query_executor=self.query_executor,
+            )
+        self.athena_streams = None
+        event_types = event_types_for(self.STREAM_TYPES)
+        if event_types:
+            self.athena_streams = AthenaStreams(
+                self.athena_client, self.S3_STAGING_DIR, self.S3_BUCKET_NAME, self.ATHENA_MINI_DB, self.PROJECT_NAME,
+                event_types,
+                self.athena_ticker.partition_projection,
+                partition_layout=self.PARTITION_LAYOUT,
+                query_executor=self.query_executor,
+            )
         self.logger = logging.getLogger(self.__class__.__name__)
 
     def get_client(self):
         return self.athena_client
 
     def run_query(self, query: str, database: str = None) -> bool:  # type: ignore
-        params = {
-            "QueryString": query,
-            "ResultConfiguration": {
-                "OutputLocation": f"{self.S3_STAGING_DIR}/"
-            },
-        }
-        if database:
-            params["QueryExecutionContext"] = {"Database": database}
-
-        response = self.get_client().start_query_execution(**params)
-        query_execution_id = response["QueryExecutionId"]
-
-        while True:
-            result = self.get_client().get_query_execution(
-                QueryExecutionId=query_execution_id
-            )
-            status = result["QueryExecution"]["Status"]["State"]
-            if status in ["SUCCEEDED", "FAILED", "CANCELLED"]:
-                break
-            time.sleep(1)
+        return self.query_executor.run_query(query, database)
 
-        self.logger.info(f"📌Query status : {status}")
-        return status == "SUCCEEDED"
+    def database_query(self):
+        return f"CREATE DATABASE IF NOT EXISTS {self.ATHENA_MINI_DB}"
 
     def create_database(self):
-        query = f"CREATE DATABASE IF NOT EXISTS {self.ATHENA_MINI_DB}"
-        if self.run_query(query):
+        if self.run_query(self.database_query()):
             self.logger.info("✅ Database created successfully")
         else:
             self.logger.error("❌ Failed to create database")
 
     def run_athena(self):
-        self.create_database()
-        self.athena_ticker.run()
+        # Database first, then each dependency level concurrently
+        stages = [[("database", self.database_query(), None)]]
+        stages += self.athena_ticker.stages()
+        if self.athena_bars is not None:
+            # Tables of every component share the first level
+            stages[1] += self.athena_bars.stages()[0]
+        if self.athena_streams is not None:
+            stages[1] += self.athena_streams.stages()[0]
+        return self.query_executor.run_stages(stages)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,61 @@
+import logging
+import pyarrow as pa
+from src.athena.query_executor import QueryExecutor
+
+
+class AthenaStreams:
+    """Athena tables over the trade, kline and depth files of LambdaConsume.
+
+    Columns come from each EventType's Arrow schema, partitions follow the
+    ticker layout through `partition_projection(root)`.
+    """
+
+    def __init__(self, athena_client, s3_staging, s3_bucket_name, athena_db, project_name,
+                 event_types, partition_projection, partition_layout=None, query_executor=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.s3_bucket_name = s3_bucket_name
+        self.athena_db = athena_db
+        self.project_name = project_name
+        self.event_types = event_types
+        self.partition_projection = partition_projection
+        self.partition_layout = partition_layout or []
+        self.query_executor = query_executor or QueryExecutor(
+            athena_client, s3_staging)
+
+    @staticmethod
+    def athena_type(field_type):
+        if pa.types.is_timestamp(field_type):
+            return "TIMESTAMP"
+        if pa.types.is_floating(field_type):
+            return "DOUBLE"
+        if pa.types.is_integer(field_type):
+            return "BIGINT"
+        if pa.types.is_boolean(field_type):
+            return "BOOLEAN"
+        return "STRING"
+
+    def table_query(self, spec):
+        root = f"{self.project_name}_{spec.table}"
+        columns = ",\n".join(
+            f"{field.name} {self.athena_type(field.type)}" for field in spec.schema
+            if field.name not in self.partition_layout
+        )
+        partitioned_by, tblproperties = self.partition_projection(root)
+        return f"""
+            CREATE EXTERNAL TABLE IF NOT EXISTS {spec.table} (
+                {columns}
+            )
+            {partitioned_by}
+            STORED AS PARQUET
+            LOCATION 's3://{self.s3_bucket_name}/{root}/'
+            {tblproperties}
+            """
+
+    def stages(self):
+        return [[
+            (f"{spec.table} table", self.table_query(spec), self.athena_db)
+            for spec in self.event_types
+        ]]
+
+    def run(self):
+        return self.query_executor.run_stages(self.stages())
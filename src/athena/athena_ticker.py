@@ -1,9 +1,37 @@
-import time
 import logging
+from src.athena.query_executor import QueryExecutor
 
 
 class AthenaTicker:
-    def __init__(self, athena_client, s3_staging, s3_bucket_name, athena_db, project_name):
+    TICKER_COLUMNS = [
+        ("event", "STRING"),
+        ("event_time", "TIMESTAMP"),
+        ("symbol", "STRING"),
+        ("price_change", "DOUBLE"),
+        ("price_change_percent", "DOUBLE"),
+        ("weighted_avg_price", "DOUBLE"),
+        ("prev_close_price", "DOUBLE"),
+        ("last_price", "DOUBLE"),
+        ("last_qty", "DOUBLE"),
+        ("best_bid_price", "DOUBLE"),
+        ("best_bid_qty", "DOUBLE"),
+        ("best_ask_price", "DOUBLE"),
+        ("best_ask_qty", "DOUBLE"),
+        ("open_price", "DOUBLE"),
+        ("high_price", "DOUBLE"),
+        ("low_price", "DOUBLE"),
+        ("base_volume", "DOUBLE"),
+        ("quote_volume", "DOUBLE"),
+        ("open_time", "TIMESTAMP"),
+        ("close_time", "TIMESTAMP"),
+        ("first_trade_id", "BIGINT"),
+        ("last_trade_id", "BIGINT"),
+        ("trade_count", "BIGINT"),
+    ]
+
+    def __init__(self, athena_client, s3_staging, s3_bucket_name, athena_db, project_name,
+                 partition_layout=None, symbols=None, partition_start_date="2025-01-01",
+                 view_lookback_days=1, query_executor=None, snapshot_enabled=True):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.athena_client = athena_client
         self.s3_staging = s3_staging
@@ -11,68 +39,119 @@ class AthenaTicker:
         self.athena_db = athena_db
         self.project_name = project_name
         self.tabke_name = "ticker"
+        # Hive-style partitions written by LambdaConsume, e.g. ["dt", "hour"]
+        self.partition_layout = partition_layout or []
+        self.symbols = [symbol.upper() for symbol in symbols or []]
+        self.partition_start_date = partition_start_date
+        self.view_lookback_days = view_lookback_days
+        # Views read the latest-per-symbol snapshot written by LambdaConsume
+        self.snapshot_enabled = snapshot_enabled
+        if "symbol" in self.partition_layout and not self.symbols and not snapshot_enabled:
+            # Without the snapshot the views rank every symbol of the ticker
+            # table, which Athena refuses on an injected partition
+            raise ValueError(
+                "A symbol partition without PARTITION_SYMBOLS needs the snapshot "
+                "(SNAPSHOT_INTERVAL > 0) for the ticker views")
+        self.query_executor = query_executor or QueryExecutor(
+            athena_client, s3_staging)
 
     def run_query(self, query: str, database: str = None) -> bool:  # type: ignore
-        params = {
-            "QueryString": query,
-            "ResultConfiguration": {
-                "OutputLocation": f"{self.s3_staging}/"
-            },
-        }
-        if database:
-            params["QueryExecutionContext"] = {"Database": database}
-        response = self.athena_client.start_query_execution(**params)
-        query_execution_id = response["QueryExecutionId"]
-
-        while True:
-            result = self.athena_client.get_query_execution(
-                QueryExecutionId=query_execution_id
-            )
-            status = result["QueryExecution"]["Status"]["State"]
-            if status in ["SUCCEEDED", "FAILED", "CANCELLED"]:
-                break
-            time.sleep(1)
+        return self.query_executor.run_query(query, database)
 
-        self.logger.info(f"📌Query status : {status}")
-        return status == "SUCCEEDED"
+    def partition_projection(self, root=None):
+        """PARTITIONED BY and TBLPROPERTIES clauses for partition projection.
 
-    def create_ticker_table(self):
+        Partitions are resolved from the key layout at query time, so no
+        MSCK REPAIR or ADD PARTITION is ever needed. `root` is the S3 prefix
+        of the table, the ticker's by default.
+
+        A symbol partition is an enum of `symbols` only when that list is
+        static; symbols outside it are invisible to queries. Without one it
+        is injected, and every query must filter on symbol; the ticker views
+        then read the snapshot only.
+        """
+        if not self.partition_layout:
+            return "", ""
+
+        location = f"s3://{self.s3_bucket_name}/{root or self.project_name}"
+        properties = {"projection.enabled": "true"}
+        for name in self.partition_layout:
+            location += f"/{name}=${{{name}}}"
+            if name == "dt":
+                properties.update({
+                    "projection.dt.type": "date",
+                    "projection.dt.format": "yyyy-MM-dd",
+                    "projection.dt.range": f"{self.partition_start_date},NOW",
+                    "projection.dt.interval": "1",
+                    "projection.dt.interval.unit": "DAYS",
+                })
+            elif name == "hour":
+                properties.update({
+                    "projection.hour.type": "integer",
+                    "projection.hour.range": "0,23",
+                    "projection.hour.digits": "2",
+                })
+            elif name == "symbol" and self.symbols:
+                properties.update({
+                    "projection.symbol.type": "enum",
+                    "projection.symbol.values": ",".join(self.symbols),
+                })
+            else:
+                self.logger.warning(
+                    f"⚠️ No static values for partition {name}, queries must filter on it")
+                properties[f"projection.{name}.type"] = "injected"
+        properties["storage.location.template"] = f"{location}/"
+
+        partitioned_by = "PARTITIONED BY ({})".format(", ".join(
+            f"{name} {'INT' if name == 'hour' else 'STRING'}" for name in self.partition_layout))
+        tblproperties = "TBLPROPERTIES (\n{}\n)".format(
+            ",\n".join(f"'{key}' = '{value}'" for key, value in properties.items()))
+        return partitioned_by, tblproperties
+
+    def recent_partition_filter(self):
+        """Restrict view scans to the last few dt partitions"""
+        if "dt" not in self.partition_layout:
+            return ""
+        return (
+            "WHERE dt >= date_format(current_date - interval "
+            f"'{self.view_lookback_days}' day, '%Y-%m-%d')"
+        )
+
+    def ticker_table_query(self):
+        columns = ",\n".join(
+            f"{name} {column_type}" for name, column_type in self.TICKER_COLUMNS
+            if name not in self.partition_layout
+        )
+        partitioned_by, tblproperties = self.partition_projection()
         query = f"""
             CREATE EXTERNAL TABLE IF NOT EXISTS ticker (
-                event STRING,
-                event_time TIMESTAMP,
-                symbol STRING,
-                price_change DOUBLE,
-                price_change_percent DOUBLE,
-                weighted_avg_price DOUBLE,
-                prev_close_price DOUBLE,
-                last_price DOUBLE,
-                last_qty DOUBLE,
-                best_bid_price DOUBLE,
-                best_bid_qty DOUBLE,
-                best_ask_price DOUBLE,
-                best_ask_qty DOUBLE,
-                open_price DOUBLE,
-                high_price DOUBLE,
-                low_price DOUBLE,
-                base_volume DOUBLE,
-                quote_volume DOUBLE,
-                open_time TIMESTAMP,
-                close_time TIMESTAMP,
-                first_trade_id BIGINT,
-                last_trade_id BIGINT,
-                trade_count BIGINT
+                {columns}
             )
+            {partitioned_by}
             STORED AS PARQUET
             LOCATION 's3://{self.s3_bucket_name}/{self.project_name}/'
+            {tblproperties}
             """
-        if self.run_query(query, database=self.athena_db):
-            self.logger.info("✅ Ticker table created successfully")
-        else:
-            self.logger.error("❌ Failed to create ticker table")
+        return query
 
-    def create_haeathmap_ticker_view(self):
-        sql = f"""CREATE OR REPLACE VIEW heatmap_ticker AS
+    def ticker_latest_table_query(self):
+        columns = ",\n".join(
+            f"{name} {column_type}" for name, column_type in self.TICKER_COLUMNS)
+        return f"""
+            CREATE EXTERNAL TABLE IF NOT EXISTS ticker_latest (
+                {columns}
+            )
+            STORED AS PARQUET
+            LOCATION 's3://{self.s3_bucket_name}/{self.project_name}_latest/'
+            """
+
+    def heatmap_ticker_view_query(self):
+        if self.snapshot_enabled:
+            return f"""CREATE OR REPLACE VIEW heatmap_ticker AS
+            SELECT symbol, close_time, price_change_percent, quote_volume, 'all' AS constant
+            FROM {self.athena_db}.ticker_latest
+            """
+        return f"""CREATE OR REPLACE VIEW heatmap_ticker AS
             SELECT symbol, close_time, price_change_percent,quote_volume,'all' AS constant 
             FROM (
                 SELECT 
@@ -82,22 +161,25 @@ class AthenaTicker:
                     close_time,
                     ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY close_time DESC) AS rn
                 FROM {self.athena_db}.ticker
+                {self.recent_partition_filter()}
             ) t
             WHERE rn = 1;
 
                 """
-        if self.run_query(sql, self.athena_db):
-            self.logger.info("✅ View created successfully")
-        else:
-            self.logger.error("❌ Failed to create View")
 
-    def create_scatter_plot_ticker_view(self):
-        query = f"""CREATE OR REPLACE VIEW scatter_plot_ticker AS 
+    def scatter_plot_ticker_view_query(self):
+        if self.snapshot_enabled:
+            return f"""CREATE OR REPLACE VIEW scatter_plot_ticker AS
+            SELECT event_time, symbol, price_change_percent, quote_volume, trade_count, last_price
+            FROM {self.athena_db}.ticker_latest
+            """
+        return f"""CREATE OR REPLACE VIEW scatter_plot_ticker AS 
 WITH RankedTicker AS (
     SELECT
         *,
         ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY event_time DESC) as rn
-    FROM {self.athena_db}.ticker 
+    FROM {self.athena_db}.ticker
+    {self.recent_partition_filter()}
 )
 SELECT
     event_time,
@@ -109,12 +191,38 @@ SELECT
 FROM RankedTicker
 WHERE rn = 1;
 """
-        if self.run_query(query, self.athena_db):
+
+    def create_ticker_table(self):
+        if self.run_query(self.ticker_table_query(), database=self.athena_db):
+            self.logger.info("✅ Ticker table created successfully")
+        else:
+            self.logger.error("❌ Failed to create ticker table")
+
+    def create_haeathmap_ticker_view(self):
+        if self.run_query(self.heatmap_ticker_view_query(), self.athena_db):
+            self.logger.info("✅ View created successfully")
+        else:
+            self.logger.error("❌ Failed to create View")
+
+    def create_scatter_plot_ticker_view(self):
+        if self.run_query(self.scatter_plot_ticker_view_query(), self.athena_db):
             self.logger.info("✅ View created successfully")
         else:
             self.logger.error("❌ Failed to create View")
 
+    def stages(self):
+        """DDL grouped into stages; statements in a stage run concurrently"""
+        tables = [("ticker table", self.ticker_table_query(), self.athena_db)]
+        if self.snapshot_enabled:
+            tables.append(
+                ("ticker_latest table", self.ticker_latest_table_query(), self.athena_db))
+        return [
+            tables,
+            [
+                ("heatmap_ticker view", self.heatmap_ticker_view_query(), self.athena_db),
+                ("scatter_plot_ticker view", self.scatter_plot_ticker_view_query(), self.athena_db),
+            ],
+        ]
+
     def run(self):
-        self.create_ticker_table()
-        self.create_haeathmap_ticker_view()
-        self.create_scatter_plot_ticker_view()
+        return self.query_executor.run_stages(self.stages())
@@ -0,0 +1,161 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+
+class QueryResult:
+    def __init__(self, query_execution_id, state, data_scanned_bytes=0,
+                 engine_time_ms=0, reason=None, rows=None):
+        self.query_execution_id = query_execution_id
+        self.state = state
+        self.data_scanned_bytes = data_scanned_bytes
+        self.engine_time_ms = engine_time_ms
+        self.reason = reason
+        self.rows = rows
+
+    @property
+    def succeeded(self):
+        return self.state == "SUCCEEDED"
+
+
+class QueryExecutor:
+    """Shared Athena query runner.
+
+    Statements are submitted concurrently on a thread pool and polled with
+    exponential backoff. `submit` returns a Future of QueryResult carrying
+    the execution stats. SELECT results are cached by normalized SQL plus a
+    caller supplied freshness token.
+    """
+
+    TERMINAL_STATES = ("SUCCEEDED", "FAILED", "CANCELLED")
+
+    def __init__(self, athena_client, s3_staging, max_workers=8, poll_initial=0.1,
+                 poll_max=2.0, poll_factor=2.0, cache_ttl=300):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.athena_client = athena_client
+        self.s3_staging = s3_staging
+        self.poll_initial = poll_initial
+        self.poll_max = poll_max
+        self.poll_factor = poll_factor
+        self.cache_ttl = cache_ttl
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="AthenaQuery")
+        self._cache_lock = threading.Lock()
+        self._cache = {}
+
+    @staticmethod
+    def normalize(query):
+        return " ".join(query.split()).rstrip(";").strip()
+
+    @classmethod
+    def is_select(cls, query):
+        return cls.normalize(query).upper().startswith(("SELECT", "WITH"))
+
+    def submit(self, query, database=None, freshness=None):
+        """Start a query in the background and return a Future[QueryResult].
+
+        `freshness` identifies the data version a SELECT was run against
+        (e.g. the last flush time); a new value invalidates cached results.
+        """
+        if not self.is_select(query):
+            return self._pool.submit(self.execute, query, database, False)
+
+        cache_key = (self.normalize(query), database, freshness)
+        with self._cache_lock:
+            cached = self._cache.get(cache_key)
+            if cached and time.monotonic() - cached[0] < self.cache_ttl:
+                future = Future()
+                future.set_result(cached[1])
+                return future
+
+        future = self._pool.submit(self.execute, query, database, True)
+        future.add_done_callback(
+            lambda done: self._store(cache_key, done))
+        return future
+
+    def _store(self, cache_key, future):
+        if future.exception() is None and future.result().succeeded:
+            with self._cache_lock:
+                self._cache[cache_key] = (time.monotonic(), future.result())
+
+    def execute(self, query, database=None, fetch_rows=False):
+        params = {
+            "QueryString": query,
+            "ResultConfiguration": {
+                "OutputLocation": f"{self.s3_staging}/"
+            },
+        }
+        if database:
+            params["QueryExecutionContext"] = {"Database": database}
+        response = self.athena_client.start_query_execution(**params)
+        query_execution_id = response["QueryExecutionId"]
+
+        delay = self.poll_initial
+        while True:
+            execution = self.athena_client.get_query_execution(
+                QueryExecutionId=query_execution_id
+            )["QueryExecution"]
+            status = execution["Status"]["State"]
+            if status in self.TERMINAL_STATES:
+                break
+            time.sleep(delay)
+            delay = min(delay * self.poll_factor, self.poll_max)
+
+        statistics = execution.get("Statistics", {})
+        result = QueryResult(
+            query_execution_id,
+            status,
+            data_scanned_bytes=statistics.get("DataScannedInBytes", 0),
+            engine_time_ms=statistics.get("EngineExecutionTimeInMillis", 0),
+            reason=execution["Status"].get("StateChangeReason"),
+        )
+        if result.succeeded and fetch_rows:
+            result.rows = self.fetch_rows(query_execution_id)
+
+        self.logger.info(
+            f"📌Query status : {status} | scanned: {result.data_scanned_bytes} bytes | "
+            f"engine time: {result.engine_time_ms} ms")
+        return result
+
+    def fetch_rows(self, query_execution_id):
+        rows = []
+        paginator = self.athena_client.get_paginator("get_query_results")
+        for page in paginator.paginate(QueryExecutionId=query_execution_id):
+            for row in page["ResultSet"]["Rows"]:
+                rows.append([column.get("VarCharValue") for column in row["Data"]])
+        # first row holds the column names
+        return rows
+
+    def run_query(self, query, database=None):
+        return self.submit(query, database).result().succeeded
+
+    def run_stages(self, stages):
+        """Run stages in order, the statements inside a stage concurrently.
+
+        Each stage is a list of (label, query, database). A stage waits for
+        the previous one, e.g. views wait for the table they read.
+        """
+        succeeded = True
+        for stage in stages:
+            futures = {
+                self.submit(query, database): label
+                for label, query, database in stage
+            }
+            wait(futures)
+            for future, label in futures.items():
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.logger.error(f"❌ {label} failed: {e}")
+                    succeeded = False
+                    continue
+                if result.succeeded:
+                    self.logger.info(f"✅ {label} created successfully")
+                else:
+                    self.logger.error(f"❌ Failed to create {label}: {result.reason}")
+                    succeeded = False
+        return succeeded
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
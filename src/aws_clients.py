@@ -0,0 +1,39 @@
+import os
+import threading
+import boto3
+
+_local_clients = {}
+_shared_clients = {}
+_lock = threading.Lock()
+
+
+def get_client(service_name, region_name=None, **kwargs):
+    """Return a boto3 client, or an in-process stand-in when AWS_BACKEND=local.
+
+    Local Kinesis and S3 are shared by every component of the process, so a
+    producer and a consumer started side by side talk to each other. A local
+    endpoint such as LocalStack needs no code: boto3 already honours
+    AWS_ENDPOINT_URL and AWS_ENDPOINT_URL_<SERVICE>.
+
+    Plain boto3 clients (no extra kwargs) are thread-safe and cached per
+    service and region, so components started together share them instead
+    of each paying for client creation.
+    """
+    if os.getenv("AWS_BACKEND", "aws").lower() == "local" and service_name in ("kinesis", "s3"):
+        from src.replay.local_aws import LocalKinesis, LocalS3
+        with _lock:
+            if service_name not in _local_clients:
+                if service_name == "kinesis":
+                    _local_clients[service_name] = LocalKinesis(
+                        int(os.getenv("LOCAL_KINESIS_SHARDS", 1)))
+                else:
+                    _local_clients[service_name] = LocalS3(
+                        os.getenv("LOCAL_S3_DIR") or None)
+            return _local_clients[service_name]
+    if kwargs:
+        return boto3.client(service_name, region_name=region_name, **kwargs)
+    with _lock:
+        key = (service_name, region_name)
+        if key not in _shared_clients:
+            _shared_clients[key] = boto3.client(service_name, region_name=region_name)
+        return _shared_clients[key]
@@ -0,0 +1,221 @@
+import logging
+import threading
+import time
+from src.metrics import REGISTRY
+
+
+class BatchPublisher:
+    """Collects events and publishes them with Kinesis `put_records`.
+
+    A batch is flushed when it reaches `max_records` or `max_bytes`, or when
+    its oldest record has waited `linger_ms`. Only the records that failed
+    inside a `put_records` call are retried. `on_sent(entries)` is called
+    with the records Kinesis acknowledged, e.g. for latency metrics.
+
+    With an `aggregator` (see record_codec.RecordAggregator) each drained
+    batch is packed into a few large records before it is sent, and the
+    500 records/call cap applies to those instead of the events.
+    """
+
+    # Kinesis PutRecords hard limits
+    MAX_RECORDS_PER_CALL = 500
+    MAX_BYTES_PER_CALL = 5 * 1024 * 1024
+
+    def __init__(self, client, stream_name, max_records=500, max_bytes=5 * 1024 * 1024,
+                 linger_ms=200, max_retries=3, retry_backoff=0.1, stats_interval=60,
+                 on_sent=None, aggregator=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.client = client
+        self.stream_name = stream_name
+        self.aggregator = aggregator
+        self.max_records = max_records if aggregator else min(
+            max_records, self.MAX_RECORDS_PER_CALL)
+        self.max_bytes = min(max_bytes, self.MAX_BYTES_PER_CALL)
+        self.linger = linger_ms / 1000
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.stats_interval = stats_interval
+        self.on_sent = on_sent
+        self.put_latency = REGISTRY.histogram(
+            "kinesis_put_records_seconds", "Duration of one put_records call")
+
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._oldest = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.stats = {
+            "flushes": 0,
+            "calls": 0,
+            # Events are what `add` received; with an aggregator several
+            # of them share one Kinesis record
+            "events_sent": 0,
+            "events_retried": 0,
+            "events_dropped": 0,
+            # Records acknowledged, and records submitted including retries
+            "kinesis_records": 0,
+            "records_put": 0,
+            "flush_latency_total": 0.0,
+            "flush_latency_max": 0.0,
+        }
+
+    def start(self):
+        """Start the background thread that flushes lingering batches."""
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._linger_loop, name="BatchPublisher", daemon=True)
+            self._thread.start()
+
+    def add(self, data, partition_key, explicit_hash_key=None):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        entry = {"Data": data, "PartitionKey": partition_key}
+        if explicit_hash_key is not None:
+            entry["ExplicitHashKey"] = explicit_hash_key
+        size = len(data) + len(partition_key)
+
+        batches = []
+        with self._lock:
+            if self._buffer and self._buffer_bytes + size > self.max_bytes:
+                batches.append(self._drain_locked())
+            if not self._buffer:
+                self._oldest = time.monotonic()
+            self._buffer.append(entry)
+            self._buffer_bytes += size
+            if len(self._buffer) >= self.max_records:
+                batches.append(self._drain_locked())
+
+        for batch in batches:
+            self._publish(batch)
+
+    def flush(self):
+        with self._lock:
+            batch = self._drain_locked()
+        if batch:
+            self._publish(batch)
+
+    def close(self):
+        """Stop the linger thread and publish everything still buffered."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        self.log_stats()
+
+    def _drain_locked(self):
+        batch = self._buffer
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._oldest = None
+        return batch
+
+    def _linger_loop(self):
+        last_stats = time.monotonic()
+        while not self._stop_event.wait(self.linger / 2 or 0.01):
+            with self._lock:
+                due = self._oldest is not None and time.monotonic() - self._oldest >= self.linger
+                batch = self._drain_locked() if due else []
+            if batch:
+                self._publish(batch)
+            if time.monotonic() - last_stats >= self.stats_interval:
+                self.log_stats()
+                last_stats = time.monotonic()
+
+    def _publish(self, entries):
+        if self.aggregator is None:
+            self._send([(entry, [entry]) for entry in entries])
+            return
+        aggregated = self.aggregator.aggregate(entries)
+        for i in range(0, len(aggregated), self.MAX_RECORDS_PER_CALL):
+            self._send(aggregated[i:i + self.MAX_RECORDS_PER_CALL])
+
+    def _send(self, pending):
+        """Put [(record, events it carries)], retrying the failed records"""
+        start = time.monotonic()
+        total = sum(len(events) for _, events in pending)
+        calls = 0
+        retried = 0
+        attempt = 0
+        acked = []
+        records_acked = 0
+        records_put = 0
+
+        while pending:
+            try:
+                call_start = time.monotonic()
+                response = self.client.put_records(
+                    StreamName=self.stream_name, Records=[record for record, _ in pending])
+                self.put_latency.observe(time.monotonic() - call_start)
+                calls += 1
+                records_put += len(pending)
+                failed = []
+                for item, result in zip(pending, response["Records"]):
+                    if "ErrorCode" in result:
+                        failed.append(item)
+                    else:
+                        acked.extend(item[1])
+                        records_acked += 1
+            except Exception as e:
+                self.logger.error(f"❌ put_records failed for {len(pending)} records: {e}")
+                failed = pending
+
+            if not failed:
+                break
+            failed_events = sum(len(events) for _, events in failed)
+            attempt += 1
+            if attempt > self.max_retries:
+                self.logger.error(
+                    f"❌ Dropping {failed_events} events after {self.max_retries} retries")
+                with self._stats_lock:
+                    self.stats["events_dropped"] += failed_events
+                total -= failed_events
+                break
+            retried += failed_events
+            pending = failed
+            time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+
+        latency = time.monotonic() - start
+        with self._stats_lock:
+            self.stats["flushes"] += 1
+            self.stats["calls"] += calls
+            self.stats["events_sent"] += total
+            self.stats["events_retried"] += retried
+            self.stats["kinesis_records"] += records_acked
+            self.stats["records_put"] += records_put
+            self.stats["flush_latency_total"] += latency
+            self.stats["flush_latency_max"] = max(
+                self.stats["flush_latency_max"], latency)
+        if self.on_sent is not None and acked:
+            self.on_sent(acked)
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        calls = stats["calls"] or 1
+        flushes = stats["flushes"] or 1
+        stats["events_per_call"] = stats["events_sent"] / calls
+        # How full each put_records call was, against the 500 records cap
+        stats["records_per_call"] = stats["records_put"] / calls
+        stats["flush_latency_avg_ms"] = stats["flush_latency_total"] / flushes * 1000
+        stats["flush_latency_max_ms"] = stats["flush_latency_max"] * 1000
+        return stats
+
+    def log_stats(self):
+        stats = self.get_stats()
+        self.logger.info(
+            f"📊 Batches: {stats['flushes']} | calls: {stats['calls']} | "
+            f"events: {stats['events_sent']} in {stats['kinesis_records']} records | "
+            f"events/call: {stats['events_per_call']:.1f} | "
+            f"records/call: {stats['records_per_call']:.1f} | "
+            f"flush latency avg/max: {stats['flush_latency_avg_ms']:.1f}/"
+            f"{stats['flush_latency_max_ms']:.1f} ms | "
+            f"events retried: {stats['events_retried']} | dropped: {stats['events_dropped']}"
+        )
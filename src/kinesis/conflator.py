@@ -0,0 +1,56 @@
+import logging
+
+
+class Conflator:
+    """Keeps only the newest payload per symbol.
+
+    Every symbol has one slot. `offer` overwrites the slot, so frames that
+    arrive between two publishes are dropped, and `drain_due` hands out each
+    slot at most once per symbol interval.
+    """
+
+    def __init__(self, default_interval=1.0, intervals=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.default_interval = default_interval
+        self.intervals = intervals or {}
+        self.slots = {}
+        self.next_due = {}
+        self.offered = 0
+        self.superseded = 0
+
+    @staticmethod
+    def parse_intervals(value):
+        """Parse "btcusdt:0.5,ethusdt:0.5" into {"btcusdt": 0.5, ...}."""
+        intervals = {}
+        for item in (value or "").split(","):
+            if ":" not in item:
+                continue
+            symbol, interval = item.split(":", 1)
+            intervals[symbol.strip().lower()] = float(interval)
+        return intervals
+
+    def interval_for(self, symbol):
+        # Slots of "<symbol>@<type>" stream keys share the symbol's interval
+        return self.intervals.get(symbol.partition("@")[0], self.default_interval)
+
+    def offer(self, symbol, payload):
+        self.offered += 1
+        if symbol in self.slots:
+            self.superseded += 1
+        self.slots[symbol] = payload
+
+    def drain_due(self, now):
+        """Pop the slots whose symbol is due at `now`."""
+        due = []
+        for symbol in list(self.slots):
+            if now >= self.next_due.get(symbol, 0):
+                due.append((symbol, self.slots.pop(symbol)))
+                self.next_due[symbol] = now + self.interval_for(symbol)
+        return due
+
+    def get_stats(self):
+        return {
+            "offered": self.offered,
+            "superseded": self.superseded,
+            "pending": len(self.slots),
+        }
@@ -1,10 +1,19 @@
-import boto3
 import json
 import os
 import logging
 import websockets
 import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src.aws_clients import get_client
 from src.kinesis.topic_creator import TopicCreator
+from src.kinesis.batch_publisher import BatchPublisher
+from src.kinesis.conflator import Conflator
+from src.kinesis.partition_strategy import PartitionStrategy
+from src.kinesis.record_codec import RecordAggregator
+from src.replay.frame_recorder import FrameRecorder
+from src.metrics import REGISTRY, event_time_ms
+from src.transfom.event_types import parse_stream_types
 
 from dotenv import load_dotenv
 
@@ -12,56 +21,553 @@ load_dotenv()
 
 
 class KinesisProducer:
-    def __init__(self):
+    def __init__(self, topic_creator=None):
         self.STREAM_NAME = os.getenv('STREAM_NAME')
         self.AWS_REGION = os.getenv('AWS_REGION')
         self.PARTITION_KEY = os.getenv("PARTITION_KEY")
+        # "static" (PARTITION_KEY for everything), "symbol", "salted" or "hash"
+        self.PARTITION_STRATEGY = os.getenv(
+            "PARTITION_STRATEGY", "static").lower()
+        self.HOT_SYMBOLS = PartitionStrategy.parse_symbols(
+            os.getenv("HOT_SYMBOLS", "btcusdt,ethusdt"))
+        self.HOT_SYMBOL_BUCKETS = int(os.getenv("HOT_SYMBOL_BUCKETS", 4))
+        self.PARTITION_REFRESH_INTERVAL = int(
+            os.getenv("PARTITION_REFRESH_INTERVAL", 60))
         self.WSS_ENDPOINT = os.getenv("WSS_ENDPOINT")
         self.STREAM_TYPE = os.getenv("STREAM_TYPE")
-        self.topic_creator = TopicCreator()
-        self.TOPCOIN = self.topic_creator.get_TOPCOIN()
+        # Several Binance stream types at once, e.g. "ticker,trade,depth@100ms"
+        self.STREAM_TYPES = parse_stream_types(
+            os.getenv("STREAM_TYPES"), self.STREAM_TYPE or "ticker")
+        # Snapshot-like types where only the newest frame per symbol matters;
+        # trade, kline and depth frames are all published
+        self.CONFLATE_STREAM_TYPES = parse_stream_types(
+            os.getenv("CONFLATE_STREAM_TYPES", "ticker,miniTicker"))
+        self.COMBINED_STREAM = os.getenv(
+            "COMBINED_STREAM", "false").lower() == "true"
+        self.STREAMS_PER_CONNECTION = int(
+            os.getenv("STREAMS_PER_CONNECTION", 200))
+        self.WSS_COMBINED_ENDPOINT = os.getenv(
+            "WSS_COMBINED_ENDPOINT") or self._combined_endpoint()
+        self.MESSAGE_INTERVAL = float(os.getenv("MESSAGE_INTERVAL", 1))
+        # "conflate": keep newest payload per symbol, "sleep": legacy throttle,
+        # "none": publish every frame, e.g. for replay load tests
+        self.THROTTLE_MODE = os.getenv("THROTTLE_MODE", "conflate").lower()
+        self.CONFLATION_INTERVALS = os.getenv("CONFLATION_INTERVALS", "")
+        self.CONFLATION_TICK_MS = int(os.getenv("CONFLATION_TICK_MS", 50))
+        self.PUBLISH_QUEUE_SIZE = int(os.getenv("PUBLISH_QUEUE_SIZE", 10000))
+        self.PUBLISH_WORKERS = int(os.getenv("PUBLISH_WORKERS", 4))
+        self.PUBLISH_STATS_INTERVAL = int(
+            os.getenv("PUBLISH_STATS_INTERVAL", 60))
+        # Capture raw frames for offline replay, see src/replay
+        self.RECORD_FRAMES_PATH = os.getenv("RECORD_FRAMES_PATH")
+        self.BATCH_ENABLED = os.getenv(
+            "BATCH_ENABLED", "false").lower() == "true"
+        self.BATCH_MAX_RECORDS = int(os.getenv("BATCH_MAX_RECORDS", 500))
+        self.BATCH_MAX_BYTES = int(
+            os.getenv("BATCH_MAX_BYTES", 5 * 1024 * 1024))
+        self.BATCH_LINGER_MS = int(os.getenv("BATCH_LINGER_MS", 200))
+        self.BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", 3))
+        # "raw": frame bytes as is, "kpl" / "framed": many raw frames
+        # aggregated per Kinesis record, "json": frame JSON-encoded again
+        # (legacy, only for readers that expect it)
+        self.WIRE_FORMAT = os.getenv("WIRE_FORMAT", "raw").lower()
+        # Only for "framed": none, zlib, zstd, snappy or lz4
+        self.WIRE_COMPRESSION = os.getenv("WIRE_COMPRESSION", "none").lower()
+        self.AGGREGATION_MAX_BYTES = int(
+            os.getenv("AGGREGATION_MAX_BYTES", 51200))
+        if self.WIRE_FORMAT in RecordAggregator.FORMATS:
+            # Aggregation happens when a batch is drained
+            self.BATCH_ENABLED = True
+        # Prometheus text endpoint and periodic summary log, 0 disables them
+        self.METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+        self.METRICS_LOG_INTERVAL = int(os.getenv("METRICS_LOG_INTERVAL", 0))
+        # Reuse the caller's TopicCreator so the top-coins request runs once
+        self._owns_topic_creator = topic_creator is None
+        self.topic_creator = topic_creator or TopicCreator()
+        self.TOPCOIN = list(self.topic_creator.get_TOPCOIN())
         self.logger = logging.getLogger(self.__class__.__name__)
-        self.client = boto3.client('kinesis', region_name=self.AWS_REGION)
-        if not TopicCreator.TOPCOIN:
-            "TOPCOIN list is empty. ProducerManager might not function as expected."
+        self.client = get_client('kinesis', region_name=self.AWS_REGION)
+        self.partitioner = PartitionStrategy(
+            self.PARTITION_STRATEGY,
+            static_key=self.PARTITION_KEY,
+            symbols=self.TOPCOIN,
+            hot_symbols=self.HOT_SYMBOLS,
+            salt_buckets=self.HOT_SYMBOL_BUCKETS,
+            client=self.client,
+            stream_name=self.STREAM_NAME,
+        )
+        self.publisher = None
+        self.conflator = None
+        if self.THROTTLE_MODE == "conflate":
+            self.conflator = Conflator(
+                default_interval=self.MESSAGE_INTERVAL,
+                intervals=Conflator.parse_intervals(self.CONFLATION_INTERVALS),
+            )
+        self._last_sent = {}
+        self.recorder = None
+        if self.RECORD_FRAMES_PATH:
+            self.recorder = FrameRecorder(self.RECORD_FRAMES_PATH)
+        # One queue per publish worker, see queue_for
+        self.queues = []
+        self.executor = None
+        self._loop = None
+        self._main_task = None
+        self._stopping = False
+        # Combined connections: {"streams": [...], "ws": socket or None, "task": Task}
+        self._connections = []
+        # Per-stream connections: "<symbol>@<type>" -> Task
+        self._stream_tasks = {}
+        self._request_id = 0
+        self.publish_stats = {
+            "published": 0,
+            "failed": 0,
+            "backpressure_waits": 0,
+            "queue_depth_max": 0,
+            "publish_latency_total": 0.0,
+            "publish_latency_max": 0.0,
+        }
+        self.frames_received = REGISTRY.counter(
+            "producer_frames_received_total", "WebSocket frames received")
+        self.events_published = REGISTRY.counter(
+            "producer_events_published_total", "Events acknowledged by Kinesis")
+        self.events_failed = REGISTRY.counter(
+            "producer_events_failed_total", "Events that failed to publish")
+        self.queue_depth = REGISTRY.gauge(
+            "producer_queue_depth", "Events waiting for a publish worker")
+        self.receive_latency = REGISTRY.histogram(
+            "producer_event_to_receive_seconds", "Binance event time to WebSocket receive")
+        self.ack_latency = REGISTRY.histogram(
+            "producer_event_to_ack_seconds", "Binance event time to Kinesis acknowledgement")
+        self.put_latency = REGISTRY.histogram(
+            "producer_publish_seconds", "Time a publish worker spends on one event")
+        if self.BATCH_ENABLED:
+            self.publisher = BatchPublisher(
+                self.client,
+                self.STREAM_NAME,
+                max_records=self.BATCH_MAX_RECORDS,
+                max_bytes=self.BATCH_MAX_BYTES,
+                linger_ms=self.BATCH_LINGER_MS,
+                max_retries=self.BATCH_MAX_RETRIES,
+                on_sent=self.observe_acked,
+                aggregator=self.create_aggregator(),
+            )
+        if not self.TOPCOIN:
+            self.logger.warning(
+                "⚠️ TOPCOIN list is empty, streams start once the top coins refresh succeeds")
 
         self.logger.info(
-            f"📌 TOPCOIN from TopicCreator: {TopicCreator.TOPCOIN}")
+            f"📌 TOPCOIN from TopicCreator: {self.TOPCOIN}")
+
+    def create_aggregator(self):
+        if self.WIRE_FORMAT not in RecordAggregator.FORMATS:
+            return None
+        return RecordAggregator(
+            self.WIRE_FORMAT,
+            compression=self.WIRE_COMPRESSION,
+            max_bytes=self.AGGREGATION_MAX_BYTES,
+        )
+
+    def encode_event(self, event_data):
+        if self.WIRE_FORMAT == "json":
+            return json.dumps(event_data)
+        return event_data
+
+    def _combined_endpoint(self):
+        # wss://stream.binance.com:9443/ws -> wss://stream.binance.com:9443/stream
+        endpoint = (self.WSS_ENDPOINT or "").rstrip("/")
+        if endpoint.endswith("/ws"):
+            endpoint = endpoint[:-3]
+        return f"{endpoint}/stream"
+
+    @staticmethod
+    def split_combined_frame(message):
+        """Return (stream_name, data_json) of a combined-stream frame.
+
+        Binance wraps every payload as {"stream":"<name>","data":<payload>},
+        so the payload is sliced out without re-serializing it.
+        """
+        end = message.find('"', 11) if message.startswith('{"stream":"') else -1
+        if end != -1:
+            rest = message[end + 1:]
+            if rest.startswith(',"data":') and rest.endswith("}"):
+                return message[11:end], rest[8:-1]
+        frame = json.loads(message)
+        if "stream" not in frame or "data" not in frame:
+            # e.g. SUBSCRIBE acknowledgements
+            return None, None
+        return frame["stream"], json.dumps(frame["data"])
+
+    def observe_received(self, message):
+        self.frames_received.inc()
+        event_time = event_time_ms(message)
+        if event_time is not None:
+            self.receive_latency.observe(max(0.0, time.time() - event_time / 1000))
+
+    def observe_acked(self, entries):
+        """Event-to-ack latency of records acknowledged by put_records"""
+        now = time.time()
+        for entry in entries:
+            event_time = event_time_ms(entry["Data"])
+            if event_time is not None:
+                self.ack_latency.observe(max(0.0, now - event_time / 1000))
+        self.events_published.inc(len(entries))
+
+    def stream_key(self, symbol, stream_type):
+        # Bare symbols while a single type is streamed, as before
+        if len(self.STREAM_TYPES) > 1:
+            return f"{symbol}@{stream_type}"
+        return symbol
+
+    def is_conflated(self, key):
+        stream_type = key.partition("@")[2] or self.STREAM_TYPES[0]
+        return stream_type in self.CONFLATE_STREAM_TYPES
+
+    async def handle_message(self, symbol, message):
+        """`symbol` is a bare symbol or a "<symbol>@<type>" stream key"""
+        if self.THROTTLE_MODE == "none" or not self.is_conflated(symbol):
+            await self.enqueue_event(symbol, message)
+            return
+        if self.conflator is not None:
+            # Overwrite the symbol slot, run_conflation publishes it
+            self.conflator.offer(symbol, message)
+            return
+        # limit one message per MESSAGE_INTERVAL per symbol
+        now = time.monotonic()
+        if now - self._last_sent.get(symbol, 0) < self.MESSAGE_INTERVAL:
+            return
+        self._last_sent[symbol] = now
+        await self.enqueue_event(symbol, message)
 
-    def send_event(self, event_data):
+    def queue_for(self, symbol):
+        """Queue of the one worker that publishes every event of `symbol`.
+
+        Events of a symbol, all stream types included, are sent one at a time
+        in arrival order, so unbatched put_record calls land in Kinesis in
+        that order. With BATCH_ENABLED, concurrent flushes and partial-failure
+        retries can still reorder them; the consumer orders by event time.
+        """
+        key = (symbol or "").partition("@")[0]
+        return self.queues[hash(key) % len(self.queues)]
+
+    def queued(self):
+        return sum(queue.qsize() for queue in self.queues)
+
+    async def enqueue_event(self, symbol, message):
+        """Hand a message to the publisher workers.
+
+        The queues are bounded: when Kinesis falls behind, receiving waits
+        here instead of buffering without limit.
+        """
+        queue = self.queue_for(symbol)
+        if queue.full():
+            self.publish_stats["backpressure_waits"] += 1
+        await queue.put((symbol, message))
+        depth = self.queued()
+        if depth > self.publish_stats["queue_depth_max"]:
+            self.publish_stats["queue_depth_max"] = depth
+
+    async def publish_worker(self, queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            symbol, message = await queue.get()
+            self.queue_depth.set(self.queued())
+            start = time.monotonic()
+            try:
+                # boto3 is blocking, keep it off the event loop
+                await loop.run_in_executor(self.executor, self.send_event, message, symbol)
+                self.publish_stats["published"] += 1
+            except Exception as e:
+                self.publish_stats["failed"] += 1
+                self.events_failed.inc()
+                self.logger.error(f"❌ Failed to publish event: {e}")
+            finally:
+                latency = time.monotonic() - start
+                self.put_latency.observe(latency)
+                self.publish_stats["publish_latency_total"] += latency
+                self.publish_stats["publish_latency_max"] = max(
+                    self.publish_stats["publish_latency_max"], latency)
+                queue.task_done()
+
+    async def run_conflation(self):
+        """Publish the newest payload of each due symbol on its cadence"""
+        tick = self.CONFLATION_TICK_MS / 1000
+        while True:
+            await asyncio.sleep(tick)
+            for symbol, message in self.conflator.drain_due(time.monotonic()):
+                await self.enqueue_event(symbol, message)
+
+    async def refresh_partitions(self):
+        """Follow reshards so explicit hash keys target open shards"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.PARTITION_REFRESH_INTERVAL)
+            try:
+                await loop.run_in_executor(self.executor, self.partitioner.refresh)
+            except Exception as e:
+                self.logger.error(f"❌ Failed to refresh shard map: {e}")
+
+    async def report_publish_stats(self):
+        while True:
+            await asyncio.sleep(self.PUBLISH_STATS_INTERVAL)
+            stats = self.publish_stats
+            done = (stats["published"] + stats["failed"]) or 1
+            self.logger.info(
+                f"📊 Queue depth: {self.queued()} (max {stats['queue_depth_max']}) | "
+                f"published: {stats['published']} | failed: {stats['failed']} | "
+                f"backpressure waits: {stats['backpressure_waits']} | "
+                f"publish latency avg/max: {stats['publish_latency_total'] / done * 1000:.1f}/"
+                f"{stats['publish_latency_max'] * 1000:.1f} ms"
+            )
+            if self.conflator is not None:
+                conflation = self.conflator.get_stats()
+                self.logger.info(
+                    f"📊 Conflation offered: {conflation['offered']} | "
+                    f"superseded: {conflation['superseded']} | pending: {conflation['pending']}"
+                )
+            stats["queue_depth_max"] = self.queued()
+
+    def drain_queue(self):
+        """Publish whatever is still queued or conflated, used on shutdown."""
+        drained = 0
+        # Queued events are older than the conflated ones
+        for queue in self.queues:
+            while not queue.empty():
+                symbol, message = queue.get_nowait()
+                self.send_event(message, symbol)
+                drained += 1
+        if self.conflator is not None:
+            for symbol, message in self.conflator.drain_due(float("inf")):
+                self.send_event(message, symbol)
+                drained += 1
+        if drained:
+            self.logger.info(f"✅ Drained {drained} queued events")
+
+    def send_event(self, event_data, symbol=None):
+        if symbol is not None:
+            # Every stream type of a symbol shares its partition key
+            symbol = symbol.partition("@")[0]
+        partition_key, explicit_hash_key = self.partitioner.key_for(symbol)
+        if self.publisher is not None:
+            # Buffered: flushed by size, count or linger time
+            self.publisher.add(self.encode_event(event_data), partition_key, explicit_hash_key)
+            return None
+        params = {}
+        if explicit_hash_key is not None:
+            params["ExplicitHashKey"] = explicit_hash_key
         response = self.client.put_record(
             StreamName=self.STREAM_NAME,
-            Data=json.dumps(event_data),
-            PartitionKey=self.PARTITION_KEY
+            Data=self.encode_event(event_data),
+            PartitionKey=partition_key,
+            **params
         )
+        event_time = event_time_ms(event_data)
+        if event_time is not None:
+            self.ack_latency.observe(max(0.0, time.time() - event_time / 1000))
+        self.events_published.inc()
         return response
 
-    async def fetch_stream(self, symbol):
-        url = f"{self.WSS_ENDPOINT}/{symbol}@{self.STREAM_TYPE}"
+    async def fetch_stream(self, symbol, stream_type=None):
+        stream_type = stream_type or self.STREAM_TYPES[0]
+        url = f"{self.WSS_ENDPOINT}/{symbol}@{stream_type}"
+        key = self.stream_key(symbol, stream_type)
         while True:
             try:
                 async with websockets.connect(url) as ws:
                     self.logger.info(f"📡 Connected to {url}")
                     while True:
                         message = await ws.recv()
-                        # Process the message
-                        self.send_event(message)
-                        # limit One message per second
-                        await asyncio.sleep(1)
+                        self.observe_received(message)
+                        if self.recorder is not None:
+                            self.recorder.record(key, message)
+                        # Same conflation and MESSAGE_INTERVAL throttle as the
+                        # combined stream; reading never pauses
+                        await self.handle_message(key, message)
             except Exception as e:
                 self.logger.error(
                     f"🔄 WebSocket error for {url}: {e}. Reconnecting in 3s...")
                 await asyncio.sleep(3)
 
-    async def start_publish(self):
-        """Start multiple WebSocket connections concurrently"""
-        tasks = []
-        for symbol in self.TOPCOIN:
-            self.logger.info(
-                f"📡 Preparing to start WebSocket stream for {symbol}@{self.STREAM_TYPE}"
-            )
-            tasks.append(self.fetch_stream(symbol))
-        await asyncio.gather(*tasks)
+    async def fetch_combined_stream(self, connection):
+        """Subscribe many "<symbol>@<type>" streams on one shared connection.
+
+        `connection["streams"]` may change while connected (see
+        update_symbols); a reconnect subscribes its current content.
+        """
+        while connection["streams"]:
+            streams = connection["streams"]
+            url = f"{self.WSS_COMBINED_ENDPOINT}?streams={'/'.join(streams)}"
+            try:
+                async with websockets.connect(url) as ws:
+                    connection["ws"] = ws
+                    self.logger.info(
+                        f"📡 Connected combined stream with {len(streams)} streams")
+                    while True:
+                        message = await ws.recv()
+                        stream, data = self.split_combined_frame(message)
+                        if stream is None:
+                            continue
+                        self.observe_received(data)
+                        # Demultiplex by stream name: "<symbol>@<type>"
+                        symbol, _, stream_type = stream.partition("@")
+                        key = self.stream_key(symbol, stream_type)
+                        if self.recorder is not None:
+                            self.recorder.record(key, data)
+                        await self.handle_message(key, data)
+            except Exception as e:
+                self.logger.error(
+                    f"🔄 Combined WebSocket error for {streams[0]}..{streams[-1]}: {e}. Reconnecting in 3s...")
+                await asyncio.sleep(3)
+            finally:
+                connection["ws"] = None
+
+    def start_combined_stream(self, streams):
+        connection = {"streams": list(streams), "ws": None}
+        connection["task"] = asyncio.create_task(self.fetch_combined_stream(connection))
+        self._connections.append(connection)
+
+    def start_stream(self, symbol, stream_type):
+        self._stream_tasks[f"{symbol}@{stream_type}"] = asyncio.create_task(
+            self.fetch_stream(symbol, stream_type))
+
+    async def send_subscription(self, connection, method, streams):
+        """SUBSCRIBE / UNSUBSCRIBE on a live combined connection"""
+        ws = connection["ws"]
+        if ws is None:
+            # Reconnecting, the new URL already reflects the change
+            return
+        self._request_id += 1
+        try:
+            await ws.send(json.dumps({"method": method, "params": streams, "id": self._request_id}))
+        except Exception as e:
+            # The reconnect that follows subscribes the current streams
+            self.logger.error(f"❌ {method} of {len(streams)} streams failed: {e}")
+
+    async def update_symbols(self, added, removed):
+        """Follow a TOPCOIN change without restarting the connections"""
+        gone = set(removed)
+        self.TOPCOIN = [symbol for symbol in self.TOPCOIN if symbol not in gone]
+        added = [symbol for symbol in added if symbol not in self.TOPCOIN]
+        self.TOPCOIN += added
+        # Rebuilds the shard slots so new symbols get their own
+        self.partitioner.set_symbols(self.TOPCOIN)
+        if not self.COMBINED_STREAM:
+            for key in [key for key in self._stream_tasks if key.partition("@")[0] in gone]:
+                self._stream_tasks.pop(key).cancel()
+            for symbol in added:
+                for stream_type in self.STREAM_TYPES:
+                    self.start_stream(symbol, stream_type)
+        else:
+            for connection in list(self._connections):
+                dropped = [s for s in connection["streams"] if s.partition("@")[0] in gone]
+                if not dropped:
+                    continue
+                connection["streams"] = [s for s in connection["streams"] if s not in dropped]
+                if connection["streams"]:
+                    await self.send_subscription(connection, "UNSUBSCRIBE", dropped)
+                else:
+                    connection["task"].cancel()
+                    self._connections.remove(connection)
+            size = max(1, self.STREAMS_PER_CONNECTION)
+            streams = [
+                f"{symbol}@{stream_type}"
+                for symbol in added for stream_type in self.STREAM_TYPES
+            ]
+            # Fill free room on open connections before opening new ones
+            for connection in self._connections:
+                room = size - len(connection["streams"])
+                if streams and room > 0:
+                    taken, streams = streams[:room], streams[room:]
+                    connection["streams"] = connection["streams"] + taken
+                    await self.send_subscription(connection, "SUBSCRIBE", taken)
+            for i in range(0, len(streams), size):
+                self.start_combined_stream(streams[i:i + size])
+        self.logger.info(
+            f"🔁 Symbols changed, added {added}, removed {removed}; streaming {len(self.TOPCOIN)}")
+
+    def on_symbols_changed(self, added, removed):
+        # Called from the TopicCreator refresh thread
+        loop = self._loop
+        if loop is not None and self._main_task is not None and not self._stopping:
+            asyncio.run_coroutine_threadsafe(self.update_symbols(added, removed), loop)
+
+    def stop(self):
+        """Stop start_publish from any thread, it drains before returning"""
+        # Flag first: a start_publish that has not begun yet sees it and returns
+        self._stopping = True
+        loop, task = self._loop, self._main_task
+        if loop is not None and task is not None:
+            loop.call_soon_threadsafe(task.cancel)
+
+    async def start_publish(self, sources=None):
+        """Start multiple WebSocket connections concurrently.
+
+        `sources` replaces the WebSocket connections with other frame
+        producers, e.g. FrameReplayer.replay(self).
+        """
+        self._loop = asyncio.get_running_loop()
+        self._main_task = asyncio.current_task()
+        if self._stopping:
+            return
+        REGISTRY.start(self.METRICS_PORT, self.METRICS_LOG_INTERVAL)
+        workers_count = max(1, self.PUBLISH_WORKERS)
+        # PUBLISH_QUEUE_SIZE is shared out between the workers
+        self.queues = [
+            asyncio.Queue(maxsize=max(1, self.PUBLISH_QUEUE_SIZE // workers_count))
+            for _ in range(workers_count)
+        ]
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers_count, thread_name_prefix="KinesisPublish")
+        workers = [asyncio.create_task(self.publish_worker(queue)) for queue in self.queues]
+        workers.append(asyncio.create_task(self.report_publish_stats()))
+        if self.conflator is not None:
+            workers.append(asyncio.create_task(self.run_conflation()))
+        if self.partitioner.mode == "hash" and self.PARTITION_REFRESH_INTERVAL > 0:
+            workers.append(asyncio.create_task(self.refresh_partitions()))
+        if self.publisher is not None:
+            self.publisher.start()
+        try:
+            if sources:
+                await asyncio.gather(*sources)
+            else:
+                if self.COMBINED_STREAM:
+                    size = max(1, self.STREAMS_PER_CONNECTION)
+                    # Types of a symbol stay together on one connection
+                    streams = [
+                        f"{symbol}@{stream_type}"
+                        for symbol in self.TOPCOIN for stream_type in self.STREAM_TYPES
+                    ]
+                    for i in range(0, len(streams), size):
+                        self.logger.info(
+                            f"📡 Preparing combined WebSocket stream for {len(streams[i:i + size])} streams")
+                        self.start_combined_stream(streams[i:i + size])
+                else:
+                    for symbol in self.TOPCOIN:
+                        for stream_type in self.STREAM_TYPES:
+                            self.logger.info(
+                                f"📡 Preparing to start WebSocket stream for {symbol}@{stream_type}"
+                            )
+                            self.start_stream(symbol, stream_type)
+                # Connections come and go with the symbol list, run until stopped
+                self.topic_creator.add_listener(self.on_symbols_changed)
+                self.topic_creator.start()
+                await asyncio.get_running_loop().create_future()
+        except asyncio.CancelledError:
+            self.logger.info("🛑 Producer stopping, draining buffered events...")
+        finally:
+            self._main_task = None
+            self.topic_creator.remove_listener(self.on_symbols_changed)
+            if self._owns_topic_creator:
+                self.topic_creator.stop()
+            for task in [c["task"] for c in self._connections] + list(self._stream_tasks.values()):
+                task.cancel()
+            for worker in workers:
+                worker.cancel()
+            self.executor.shutdown(wait=True)
+            self.drain_queue()
+            if self.publisher is not None:
+                self.publisher.close()
+            if self.recorder is not None:
+                self.recorder.close()
 
 
 if __name__ == "__main__":
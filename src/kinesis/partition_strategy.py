@@ -0,0 +1,136 @@
+import hashlib
+import itertools
+import logging
+import threading
+
+
+class PartitionStrategy:
+    """Chooses the Kinesis partition key (and explicit hash key) per event.
+
+    Modes:
+      - "static": every record uses `static_key`, the legacy single shard
+      - "symbol": the symbol is the key, so a symbol stays on one shard
+      - "salted": like "symbol", but `hot_symbols` rotate over
+        `salt_buckets` keys ("btcusdt#0".."btcusdt#3") so one busy
+        symbol can use several shards
+      - "hash": symbols are assigned round-robin to the open shards and sent
+        with the midpoint of the shard hash range as ExplicitHashKey, so
+        load spreads evenly instead of depending on MD5 luck; hot symbols
+        take `salt_buckets` assignments each
+
+    A key pins a symbol to a shard; it does not order its records. The
+    producer sends a symbol's events in order only without batching (see
+    KinesisProducer.queue_for): BatchPublisher flushes and retries can
+    reorder them, and salted symbols spread over several shards. Every
+    event carries its event time, and the consumer orders by that time.
+    """
+
+    MODES = ("static", "symbol", "salted", "hash")
+
+    def __init__(self, mode="static", static_key=None, symbols=None, hot_symbols=None,
+                 salt_buckets=4, client=None, stream_name=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown partition strategy {mode!r}, expected one of {self.MODES}")
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.mode = mode
+        self.static_key = static_key
+        self.symbols = [symbol.lower() for symbol in symbols or []]
+        self.hot_symbols = {symbol.lower() for symbol in hot_symbols or []}
+        self.salt_buckets = max(1, salt_buckets)
+        self.client = client
+        self.stream_name = stream_name
+        self._lock = threading.Lock()
+        # symbol -> cycle over its (partition_key, explicit_hash_key) pairs
+        self._assignments = {}
+        self._shard_hash_keys = []
+        if mode == "hash":
+            self.refresh()
+
+    @staticmethod
+    def parse_symbols(value):
+        """"btcusdt,ethusdt" -> ["btcusdt", "ethusdt"]"""
+        return [symbol.strip().lower() for symbol in (value or "").split(",") if symbol.strip()]
+
+    def _open_shard_hash_keys(self):
+        shards = []
+        params = {"StreamName": self.stream_name}
+        while True:
+            response = self.client.list_shards(**params)
+            shards.extend(response["Shards"])
+            if not response.get("NextToken"):
+                break
+            params = {"NextToken": response["NextToken"]}
+        ranges = sorted(
+            (int(shard["HashKeyRange"]["StartingHashKey"]),
+             int(shard["HashKeyRange"]["EndingHashKey"]))
+            for shard in shards
+            # Closed parents of a reshard no longer accept writes
+            if "EndingSequenceNumber" not in shard["SequenceNumberRange"]
+        )
+        return [str((start + end) // 2) for start, end in ranges]
+
+    def refresh(self):
+        """Re-read the open shards and rebuild the symbol assignment"""
+        if self.mode != "hash":
+            return
+        hash_keys = self._open_shard_hash_keys()
+        with self._lock:
+            if hash_keys == self._shard_hash_keys:
+                return
+            self._shard_hash_keys = hash_keys
+            self._assign()
+
+    def set_symbols(self, symbols):
+        """Replace the symbol list, e.g. after a TOPCOIN change"""
+        with self._lock:
+            self.symbols = [symbol.lower() for symbol in symbols]
+            if self.mode == "hash" and self._shard_hash_keys:
+                self._assign()
+
+    def _assign(self):
+        # Called with the lock held
+        hash_keys = self._shard_hash_keys
+        self._assignments = {}
+        slot = 0
+        for symbol in self.symbols:
+            count = self.salt_buckets if symbol in self.hot_symbols else 1
+            pairs = []
+            for bucket in range(count):
+                key = f"{symbol}#{bucket}" if count > 1 else symbol
+                pairs.append((key, hash_keys[slot % len(hash_keys)]))
+                slot += 1
+            self._assignments[symbol] = itertools.cycle(pairs)
+        self.logger.info(
+            f"🔀 Spread {len(self.symbols)} symbols over {len(hash_keys)} open shards")
+
+    def _salted(self, symbol):
+        pairs = self._assignments.get(symbol)
+        if pairs is None:
+            with self._lock:
+                pairs = self._assignments.setdefault(symbol, itertools.cycle(
+                    [(f"{symbol}#{bucket}", None) for bucket in range(self.salt_buckets)]))
+        return next(pairs)
+
+    def _hashed(self, symbol):
+        pairs = self._assignments.get(symbol)
+        if pairs is not None:
+            return next(pairs)
+        # Symbol outside the configured list: stable shard by MD5
+        hash_keys = self._shard_hash_keys
+        if not hash_keys:
+            return symbol, None
+        index = int(hashlib.md5(symbol.encode("utf-8")).hexdigest(), 16) % len(hash_keys)
+        return symbol, hash_keys[index]
+
+    def key_for(self, symbol):
+        """Return (partition_key, explicit_hash_key or None)"""
+        if self.mode == "static" or not symbol:
+            return self.static_key, None
+        symbol = symbol.lower()
+        if self.mode == "symbol":
+            return symbol, None
+        if self.mode == "salted":
+            if symbol in self.hot_symbols:
+                return self._salted(symbol)
+            return symbol, None
+        return self._hashed(symbol)
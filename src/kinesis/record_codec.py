@@ -0,0 +1,202 @@
+import hashlib
+import zlib
+
+# Kinesis Producer Library aggregated record magic
+KPL_MAGIC = b"\xf3\x89\x9a\xc2"
+# Framed batch of length-prefixed payloads, optionally compressed
+FRAMED_MAGIC = b"BNC1"
+
+COMPRESSIONS = ("none", "zlib", "zstd", "snappy", "lz4")
+_COMPRESSION_IDS = {name: i for i, name in enumerate(COMPRESSIONS)}
+
+
+def _varint(value):
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _read_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _field(number, payload):
+    """Length-delimited protobuf field"""
+    return _varint(number << 3 | 2) + _varint(len(payload)) + payload
+
+
+def _varint_field(number, value):
+    return _varint(number << 3) + _varint(value)
+
+
+def _compress(codec, data):
+    if codec == "none":
+        return data
+    if codec == "zlib":
+        return zlib.compress(data, 1)
+    # zstd, snappy and lz4 come with pyarrow, already a pipeline dependency
+    import pyarrow as pa
+    return pa.Codec(codec).compress(data, asbytes=True)
+
+
+def _decompress(codec, data, size):
+    if codec == "none":
+        return data
+    if codec == "zlib":
+        return zlib.decompress(data)
+    import pyarrow as pa
+    return pa.Codec(codec).decompress(data, decompressed_size=size, asbytes=True)
+
+
+def encode_kpl(entries):
+    """Pack [(partition_key, explicit_hash_key, data)] into one KPL record.
+
+    Same layout as the Kinesis Producer Library (magic, AggregatedRecord
+    protobuf, MD5), so the KCL and Lambda de-aggregation helpers can read it.
+    """
+    keys, hash_keys = {}, {}
+    records = []
+    for partition_key, explicit_hash_key, data in entries:
+        record = _varint_field(1, keys.setdefault(partition_key, len(keys)))
+        if explicit_hash_key is not None:
+            record += _varint_field(2, hash_keys.setdefault(explicit_hash_key, len(hash_keys)))
+        records.append(_field(3, record + _field(3, data)))
+    message = b"".join(
+        [_field(1, key.encode("utf-8")) for key in keys]
+        + [_field(2, key.encode("utf-8")) for key in hash_keys]
+        + records
+    )
+    return KPL_MAGIC + message + hashlib.md5(message).digest()
+
+
+def _fields(data, pos, end):
+    """Yield (field_number, value) of a protobuf message slice"""
+    while pos < end:
+        tag, pos = _read_varint(data, pos)
+        wire_type = tag & 7
+        if wire_type == 0:
+            value, pos = _read_varint(data, pos)
+        elif wire_type == 2:
+            length, pos = _read_varint(data, pos)
+            value = data[pos:pos + length]
+            pos += length
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+        yield tag >> 3, value
+
+
+def decode_kpl(data):
+    """Inner payloads of a KPL aggregated record"""
+    message = data[len(KPL_MAGIC):-16]
+    if hashlib.md5(message).digest() != data[-16:]:
+        raise ValueError("KPL aggregated record failed its MD5 check")
+    payloads = []
+    for number, value in _fields(message, 0, len(message)):
+        if number == 3:
+            payloads.extend(inner for field, inner in _fields(value, 0, len(value)) if field == 3)
+    return payloads
+
+
+def encode_framed(payloads, compression="none"):
+    """Pack payloads as varint-length frames in one compressed body"""
+    body = b"".join(_varint(len(payload)) + payload for payload in payloads)
+    return (FRAMED_MAGIC + bytes([_COMPRESSION_IDS[compression]])
+            + _varint(len(body)) + _compress(compression, body))
+
+
+def decode_framed(data):
+    codec = COMPRESSIONS[data[len(FRAMED_MAGIC)]]
+    size, pos = _read_varint(data, len(FRAMED_MAGIC) + 1)
+    body = _decompress(codec, data[pos:], size)
+    payloads = []
+    pos = 0
+    while pos < len(body):
+        length, pos = _read_varint(body, pos)
+        payloads.append(body[pos:pos + length])
+        pos += length
+    return payloads
+
+
+def decode_record(data):
+    """Payloads carried by one Kinesis record, whatever its wire format.
+
+    Plain records (a single JSON event) come back as a one-element list.
+    """
+    data = bytes(data)
+    if data[:4] == KPL_MAGIC and len(data) > 20:
+        try:
+            return decode_kpl(data)
+        except (ValueError, IndexError):
+            # Not an aggregate after all, e.g. binary data sharing the magic
+            return [data]
+    if data[:4] == FRAMED_MAGIC:
+        return decode_framed(data)
+    return [data]
+
+
+class RecordAggregator:
+    """Turns a batch of PutRecords entries into fewer, larger records.
+
+    Entries are grouped by ExplicitHashKey (or PartitionKey when there is
+    none) so every aggregate still lands on the shard its events map to,
+    and each group is cut at `max_bytes`. With "kpl" the inner records keep
+    their own partition keys; "framed" packs only the payloads and can
+    compress them.
+    """
+
+    FORMATS = ("kpl", "framed")
+
+    def __init__(self, wire_format="kpl", compression="none", max_bytes=51200):
+        if wire_format not in self.FORMATS:
+            raise ValueError(f"Unknown aggregation format {wire_format!r}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression {compression!r}, expected one of {COMPRESSIONS}")
+        if wire_format == "kpl" and compression != "none":
+            raise ValueError("KPL aggregated records cannot be compressed, use the framed format")
+        self.wire_format = wire_format
+        self.compression = compression
+        self.max_bytes = max_bytes
+
+    def _encode(self, group):
+        if self.wire_format == "kpl":
+            return encode_kpl(
+                (entry["PartitionKey"], entry.get("ExplicitHashKey"), entry["Data"])
+                for entry in group)
+        return encode_framed([entry["Data"] for entry in group], self.compression)
+
+    def aggregate(self, entries):
+        """Return [(aggregated entry, entries it carries)]"""
+        groups = {}
+        for entry in entries:
+            key = entry.get("ExplicitHashKey") or entry["PartitionKey"]
+            groups.setdefault(key, []).append(entry)
+
+        records = []
+        for group in groups.values():
+            chunk, size = [], 0
+            for entry in group:
+                entry_size = len(entry["Data"]) + len(entry["PartitionKey"]) + 8
+                if chunk and size + entry_size > self.max_bytes:
+                    records.append(self._record(chunk))
+                    chunk, size = [], 0
+                chunk.append(entry)
+                size += entry_size
+            if chunk:
+                records.append(self._record(chunk))
+        return records
+
+    def _record(self, chunk):
+        record = {"Data": self._encode(chunk), "PartitionKey": chunk[0]["PartitionKey"]}
+        if "ExplicitHashKey" in chunk[0]:
+            record["ExplicitHashKey"] = chunk[0]["ExplicitHashKey"]
+        return record, chunk
@@ -1,14 +1,29 @@
-
 import os
+import heapq
 import requests
 import json
 import logging
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
 class TopicCreator:
+    """Top-N USDT symbols by quote volume, cached on disk and kept fresh.
+
+    A cache younger than TOPCOIN_CACHE_TTL is used as is; an older one is
+    still used at startup and refreshed in the background, so only a first
+    run without any cache waits for the ranking endpoint. A failed refresh
+    keeps the last known list.
+
+    Once a symbol is in the list it stays there until it falls below rank
+    LIMIT + TOPCOIN_HYSTERESIS or a newcomer outranks it by that many
+    places, so symbols around the cutoff do not churn. Callbacks registered with
+    `add_listener` receive (added, removed) after each change.
+    """
+
     # Class attribute
     TOPCOIN = []
 
@@ -16,47 +31,168 @@ class TopicCreator:
         self.logger = logging.getLogger(self.__class__.__name__)
         self.URL_TOP = os.getenv("URL_TOP")
         self.LIMIT = int(os.getenv("LIMIT", 10))
+        self.TOPCOIN_CACHE_PATH = os.getenv(
+            "TOPCOIN_CACHE_PATH", "topcoin_cache.json")
+        self.TOPCOIN_CACHE_TTL = int(os.getenv("TOPCOIN_CACHE_TTL", 3600))
+        # Background refresh period, 0 keeps the list fixed
+        self.TOPCOIN_REFRESH_INTERVAL = int(
+            os.getenv("TOPCOIN_REFRESH_INTERVAL", 300))
+        self.TOPCOIN_HYSTERESIS = int(os.getenv("TOPCOIN_HYSTERESIS", 3))
+        self.TOPCOIN_REQUEST_TIMEOUT = float(
+            os.getenv("TOPCOIN_REQUEST_TIMEOUT", 10))
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._stale = False
         # init value for TOPCOIN
-        self.get_top_coins()
+        cached, fetched_at = self.load_cache()
+        if cached:
+            TopicCreator.TOPCOIN = cached
+            self._stale = time.time() - fetched_at >= self.TOPCOIN_CACHE_TTL
+            self.logger.info(
+                f"Loaded {'stale ' if self._stale else ''}TOPCOIN list from "
+                f"{self.TOPCOIN_CACHE_PATH}: {TopicCreator.TOPCOIN}")
+        else:
+            self.get_top_coins()
 
     @classmethod
     def get_TOPCOIN(cls):
         """Class method to access TOPCOIN."""
         return cls.TOPCOIN
 
+    def load_cache(self):
+        """Return (symbols, fetched_at) from the cache file, ([], 0) if absent"""
+        if not self.TOPCOIN_CACHE_PATH or not os.path.exists(self.TOPCOIN_CACHE_PATH):
+            return [], 0
+        try:
+            with open(self.TOPCOIN_CACHE_PATH) as f:
+                cache = json.load(f)
+            if cache.get("limit") != self.LIMIT:
+                return [], 0
+            return cache["symbols"], cache["fetched_at"]
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.warning(f"⚠️ Ignoring unreadable cache {self.TOPCOIN_CACHE_PATH}: {e}")
+            return [], 0
+
+    def save_cache(self, symbols):
+        if not self.TOPCOIN_CACHE_PATH:
+            return
+        # Write then rename, a crash never leaves a truncated cache
+        tmp_path = f"{self.TOPCOIN_CACHE_PATH}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"fetched_at": time.time(), "limit": self.LIMIT, "symbols": symbols}, f)
+        os.replace(tmp_path, self.TOPCOIN_CACHE_PATH)
+
+    def fetch_ranking(self):
+        """USDT symbols by descending quote volume, down to the hysteresis band"""
+        response = requests.get(self.URL_TOP, timeout=self.TOPCOIN_REQUEST_TIMEOUT)  # type: ignore
+        response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
+        data = response.json()
+        # Filter the coins that end with "USDT"
+        filtered_coins = [
+            coin
+            for coin in data
+            if isinstance(coin, dict)
+            and "symbol" in coin
+            and coin["symbol"].endswith("USDT")
+        ]
+        # Only the head of the ranking matters, no need to sort every symbol
+        top_coins = heapq.nlargest(
+            self.LIMIT + self.TOPCOIN_HYSTERESIS,
+            filtered_coins,
+            key=lambda x: float(x.get("quoteVolume", 0)),
+        )
+        return [coin["symbol"].lower() for coin in top_coins]
+
+    def select(self, ranking, current):
+        """Next TOPCOIN list from the ranking and the current list.
+
+        Incumbents still in the band stay, newcomers from the top LIMIT fill
+        free slots, and a newcomer replaces the lowest incumbent only when it
+        ranks TOPCOIN_HYSTERESIS places higher.
+        """
+        rank = {symbol: i for i, symbol in enumerate(ranking)}
+        kept = sorted((symbol for symbol in current if symbol in rank), key=rank.get)
+        newcomers = [symbol for symbol in ranking[:self.LIMIT] if symbol not in kept]
+        for symbol in newcomers:
+            if len(kept) < self.LIMIT:
+                kept.append(symbol)
+            elif rank[symbol] + self.TOPCOIN_HYSTERESIS <= rank[kept[-1]]:
+                kept[-1] = symbol
+            else:
+                break
+            kept.sort(key=rank.get)
+        # Incumbents first, in their previous order, so lists diff cleanly
+        return [s for s in current if s in kept] + [s for s in kept if s not in current]
+
     def get_top_coins(self):
         try:
-            response = requests.get(self.URL_TOP)  # type: ignore
-            response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
-            data = response.json()
-            # Filter the coins that end with "USDT"
-            filtered_coins = [
-                coin
-                for coin in data
-                if isinstance(coin, dict)
-                and "symbol" in coin
-                and coin["symbol"].endswith("USDT")
-            ]
-            # Sort the filtered coins by quoteVolume and take the top
-            top_coins = sorted(
-                filtered_coins,
-                key=lambda x: float(x.get("quoteVolume", 0)),
-                reverse=True,
-            )[: self.LIMIT]
-            TopicCreator.TOPCOIN = [coin["symbol"].lower()
-                                    for coin in top_coins]
-            self.logger.info(
-                f"Successfully fetched and updated TOPCOIN list: {TopicCreator.TOPCOIN}"
-            )
-        except requests.exceptions.RequestException as e:
+            ranking = self.fetch_ranking()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            # JSONDecodeError is a ValueError; keep the last known list
             self.logger.error(
                 f"Failed to get top coins from {self.URL_TOP}: {e}")
-            TopicCreator.TOPCOIN = []  # Ensure TOPCOIN is empty on failure
-        except json.JSONDecodeError as e:
-            self.logger.error(
-                f"Failed to decode JSON response from {self.URL_TOP}: {e}"
+            return False
+        with self._lock:
+            current = TopicCreator.TOPCOIN
+            symbols = self.select(ranking, current)
+            TopicCreator.TOPCOIN = symbols
+            listeners = list(self._listeners)
+        self._stale = False
+        try:
+            self.save_cache(symbols)
+        except OSError as e:
+            self.logger.warning(f"⚠️ Could not write {self.TOPCOIN_CACHE_PATH}: {e}")
+        added = [symbol for symbol in symbols if symbol not in current]
+        removed = [symbol for symbol in current if symbol not in symbols]
+        if added or removed:
+            self.logger.info(
+                f"Successfully fetched and updated TOPCOIN list: {TopicCreator.TOPCOIN} "
+                f"(added {added}, removed {removed})"
             )
-            TopicCreator.TOPCOIN = []
+            for listener in listeners:
+                try:
+                    listener(added, removed)
+                except Exception as e:
+                    self.logger.error(f"❌ TOPCOIN listener failed: {e}")
+        return True
+
+    def add_listener(self, callback):
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def start(self):
+        """Refresh every TOPCOIN_REFRESH_INTERVAL seconds on a background thread"""
+        if self._thread is not None or self.TOPCOIN_REFRESH_INTERVAL <= 0:
+            return
+
+        def next_wait():
+            if not TopicCreator.TOPCOIN:
+                # Nothing to stream yet, retry sooner
+                return min(30, self.TOPCOIN_REFRESH_INTERVAL)
+            return self.TOPCOIN_REFRESH_INTERVAL
+
+        def loop():
+            # A stale cache was used at startup, replace it right away
+            wait = 0 if self._stale else next_wait()
+            while not self._stop_event.wait(wait):
+                self.get_top_coins()
+                wait = next_wait()
+
+        self._thread = threading.Thread(target=loop, name="TopicCreator", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
 
 
 if __name__ == "__main__":
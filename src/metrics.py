@@ -0,0 +1,198 @@
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds, from sub-millisecond to a few minutes of lag
+LATENCY_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10, 30, 60, 120, 300]
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in sorted(labels.items())) + "}"
+
+
+class Counter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labels):
+        return [f"{name}{_label_text(labels)} {self.value}"]
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self, name, labels):
+        return [f"{name}{_label_text(labels)} {self.value}"]
+
+
+class Histogram:
+    def __init__(self, buckets=None):
+        self.buckets = list(buckets or LATENCY_BUCKETS)
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q):
+        """Upper bucket bound holding the q-quantile, good enough for logs"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + [float("inf")], self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def samples(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ["+Inf"], self.counts):
+            cumulative += count
+            bucket_labels = dict(labels or {}, le=bound)
+            lines.append(f"{name}_bucket{_label_text(bucket_labels)} {cumulative}")
+        lines.append(f"{name}_sum{_label_text(labels)} {self.sum}")
+        lines.append(f"{name}_count{_label_text(labels)} {self.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide counters, gauges and histograms.
+
+    Metrics are created on first use and rendered in the Prometheus text
+    format. Recording is a lock and a couple of integer updates, cheap
+    enough for the per-batch hot loops.
+    """
+
+    TYPES = {Counter: "counter", Gauge: "gauge", Histogram: "histogram"}
+
+    def __init__(self):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._lock = threading.Lock()
+        # name -> (help, {labels tuple: metric})
+        self._metrics = {}
+        self._server = None
+        self._log_thread = None
+
+    def _get(self, cls, name, help_text, labels, **kwargs):
+        key = tuple(sorted((labels or {}).items()))
+        family = self._metrics.get(name)
+        if family is None or key not in family[1]:
+            with self._lock:
+                family = self._metrics.setdefault(name, (help_text, {}))
+                family[1].setdefault(key, cls(**kwargs))
+        return family[1][key]
+
+    def counter(self, name, help_text="", labels=None):
+        return self._get(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text="", labels=None):
+        return self._get(Gauge, name, help_text, labels)
+
+    def histogram(self, name, help_text="", labels=None, buckets=None):
+        return self._get(Histogram, name, help_text, labels, buckets=buckets)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            families = sorted((name, help_text, dict(metrics))
+                              for name, (help_text, metrics) in self._metrics.items())
+        for name, help_text, metrics in families:
+            metric_type = self.TYPES[type(next(iter(metrics.values())))]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for key, metric in sorted(metrics.items()):
+                lines.extend(metric.samples(name, dict(key)))
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        parts = []
+        with self._lock:
+            families = sorted((name, dict(metrics)) for name, (_, metrics) in self._metrics.items())
+        for name, metrics in families:
+            for key, metric in sorted(metrics.items()):
+                label = name + _label_text(dict(key))
+                if isinstance(metric, Histogram):
+                    parts.append(
+                        f"{label} n={metric.count} p50<={metric.quantile(0.5)} p99<={metric.quantile(0.99)}")
+                else:
+                    parts.append(f"{label}={metric.value}")
+        return " | ".join(parts)
+
+    def start(self, port=0, log_interval=0):
+        """Serve /metrics on `port` and log a summary every `log_interval` s.
+
+        Safe to call from several components, each part starts only once.
+        """
+        with self._lock:
+            if port and self._server is None:
+                registry = self
+
+                class Handler(BaseHTTPRequestHandler):
+                    def do_GET(self):
+                        body = registry.render().encode("utf-8")
+                        self.send_response(200)
+                        self.send_header("Content-Type", "text/plain; version=0.0.4")
+                        self.send_header("Content-Length", str(len(body)))
+                        self.end_headers()
+                        self.wfile.write(body)
+
+                    def log_message(self, format, *args):
+                        pass
+
+                self._server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+                threading.Thread(target=self._server.serve_forever,
+                                 name="MetricsServer", daemon=True).start()
+                self.logger.info(f"📡 Serving metrics on :{port}/metrics")
+
+            if log_interval and self._log_thread is None:
+                def log_loop():
+                    while not stop.wait(log_interval):
+                        self.logger.info(f"📊 {self.summary()}")
+
+                stop = threading.Event()
+                self._log_thread = threading.Thread(
+                    target=log_loop, name="MetricsLog", daemon=True)
+                self._log_thread.start()
+
+
+REGISTRY = MetricsRegistry()
+
+
+def event_time_ms(message):
+    """Binance event time ("E") of a raw JSON payload, without parsing it"""
+    if isinstance(message, (bytes, bytearray)):
+        message = message.decode("utf-8", "ignore")
+    # Plain frames carry "E":, the JSON-string encoded ones \"E\":
+    for marker in ('"E":', '\\"E\\":'):
+        start = message.find(marker)
+        if start >= 0:
+            start += len(marker)
+            while start < len(message) and message[start] == " ":
+                start += 1
+            end = start
+            while end < len(message) and message[end].isdigit():
+                end += 1
+            return int(message[start:end]) if end > start else None
+    return None
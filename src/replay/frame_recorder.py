@@ -0,0 +1,28 @@
+import gzip
+import json
+import logging
+import time
+
+
+class FrameRecorder:
+    """Appends raw WebSocket frames to a gzip JSON-lines file.
+
+    Each line is [seconds since recording started, symbol, payload], which
+    is exactly what FrameReplayer feeds back into the producer.
+    """
+
+    def __init__(self, path):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.path = path
+        self.file = gzip.open(path, "at", encoding="utf-8")
+        self.start = time.monotonic()
+        self.count = 0
+
+    def record(self, symbol, message):
+        offset = round(time.monotonic() - self.start, 4)
+        self.file.write(json.dumps([offset, symbol, message]) + "\n")
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+        self.logger.info(f"✅ Recorded {self.count} frames to {self.path}")
@@ -0,0 +1,43 @@
+import asyncio
+import gzip
+import json
+import logging
+import time
+
+
+class FrameReplayer:
+    """Feeds recorded frames back through KinesisProducer.handle_message.
+
+    `speed` is a multiplier of the recorded pace (1, 10, 100, ...) or "max"
+    to replay as fast as the pipeline accepts frames.
+    """
+
+    def __init__(self, path, speed="1"):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.path = path
+        self.speed = None if str(speed).lower() == "max" else float(speed)
+        self.count = 0
+        self.elapsed = 0.0
+
+    def frames(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    async def replay(self, producer):
+        start = time.monotonic()
+        for offset, symbol, message in self.frames():
+            if self.speed:
+                delay = start + offset / self.speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif self.count % 1000 == 0:
+                # let the publisher workers run
+                await asyncio.sleep(0)
+            await producer.handle_message(symbol, message)
+            self.count += 1
+
+        self.elapsed = time.monotonic() - start
+        self.logger.info(
+            f"✅ Replayed {self.count} frames in {self.elapsed:.2f}s "
+            f"({self.count / (self.elapsed or 1):.0f} frames/s)")
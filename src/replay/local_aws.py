@@ -0,0 +1,224 @@
+import datetime
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+
+
+class LocalKinesis:
+    """In-process stand-in for the Kinesis API calls the pipeline uses.
+
+    Records are routed to shards by the MD5 of their partition key (or
+    ExplicitHashKey) over evenly split hash ranges, like the real service.
+    """
+
+    MAX_HASH_KEY = 2 ** 128 - 1
+
+    class exceptions:
+        class ExpiredIteratorException(Exception):
+            pass
+
+        class ProvisionedThroughputExceededException(Exception):
+            pass
+
+    def __init__(self, shard_count=1):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self.shards = []
+        step = (self.MAX_HASH_KEY + 1) // shard_count
+        for i in range(shard_count):
+            ending = self.MAX_HASH_KEY if i == shard_count - 1 else (i + 1) * step - 1
+            self.shards.append({
+                "ShardId": f"shardId-{i:012d}",
+                "HashKeyRange": {
+                    "StartingHashKey": str(i * step),
+                    "EndingHashKey": str(ending),
+                },
+                "SequenceNumberRange": {"StartingSequenceNumber": "0"},
+                "Records": [],
+            })
+
+    def _shard_for(self, partition_key, explicit_hash_key=None):
+        if explicit_hash_key is not None:
+            hash_key = int(explicit_hash_key)
+        else:
+            hash_key = int(hashlib.md5(partition_key.encode("utf-8")).hexdigest(), 16)
+        for shard in self.shards:
+            if int(shard["HashKeyRange"]["EndingHashKey"]) >= hash_key:
+                return shard
+        return self.shards[-1]
+
+    def _append(self, data, partition_key, explicit_hash_key=None):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        shard = self._shard_for(partition_key, explicit_hash_key)
+        with self._lock:
+            self._sequence += 1
+            sequence_number = f"{self._sequence:056d}"
+            shard["Records"].append({
+                "SequenceNumber": sequence_number,
+                "ApproximateArrivalTimestamp": datetime.datetime.now(datetime.timezone.utc),
+                "Data": bytes(data),
+                "PartitionKey": partition_key,
+            })
+        return {"ShardId": shard["ShardId"], "SequenceNumber": sequence_number}
+
+    def put_record(self, StreamName, Data, PartitionKey, ExplicitHashKey=None, **kwargs):
+        return self._append(Data, PartitionKey, ExplicitHashKey)
+
+    def put_records(self, StreamName, Records, **kwargs):
+        results = [
+            self._append(r["Data"], r["PartitionKey"], r.get("ExplicitHashKey"))
+            for r in Records
+        ]
+        return {"FailedRecordCount": 0, "Records": results}
+
+    def _public_shard(self, shard):
+        return {key: value for key, value in shard.items() if key != "Records"}
+
+    def list_shards(self, StreamName=None, NextToken=None, **kwargs):
+        return {"Shards": [self._public_shard(shard) for shard in self.shards]}
+
+    def describe_stream(self, StreamName, **kwargs):
+        return {
+            "StreamDescription": {
+                "StreamName": StreamName,
+                "StreamStatus": "ACTIVE",
+                "Shards": [self._public_shard(shard) for shard in self.shards],
+                "HasMoreShards": False,
+            }
+        }
+
+    def _shard(self, shard_id):
+        for shard in self.shards:
+            if shard["ShardId"] == shard_id:
+                return shard
+        raise KeyError(shard_id)
+
+    def get_shard_iterator(self, StreamName, ShardId, ShardIteratorType,
+                           StartingSequenceNumber=None, **kwargs):
+        records = self._shard(ShardId)["Records"]
+        with self._lock:
+            if ShardIteratorType == "TRIM_HORIZON":
+                position = 0
+            elif ShardIteratorType == "LATEST":
+                position = len(records)
+            else:
+                position = next(
+                    (i for i, r in enumerate(records)
+                     if r["SequenceNumber"] >= StartingSequenceNumber),
+                    len(records),
+                )
+                if (ShardIteratorType == "AFTER_SEQUENCE_NUMBER" and position < len(records)
+                        and records[position]["SequenceNumber"] == StartingSequenceNumber):
+                    position += 1
+        return {"ShardIterator": f"{ShardId}:{position}"}
+
+    def get_records(self, ShardIterator, Limit=10000, **kwargs):
+        shard_id, position = ShardIterator.rsplit(":", 1)
+        position = int(position)
+        records = self._shard(shard_id)["Records"]
+        with self._lock:
+            batch = records[position:position + Limit]
+            total = len(records)
+        end = position + len(batch)
+        behind = 0
+        if end < total:
+            arrival = records[end]["ApproximateArrivalTimestamp"]
+            behind = int((datetime.datetime.now(datetime.timezone.utc) - arrival).total_seconds() * 1000)
+        return {
+            "Records": batch,
+            "NextShardIterator": f"{shard_id}:{end}",
+            "MillisBehindLatest": behind,
+        }
+
+    def latest_sequence_numbers(self):
+        """{shard_id: last sequence number} of every non-empty shard"""
+        with self._lock:
+            return {
+                shard["ShardId"]: shard["Records"][-1]["SequenceNumber"]
+                for shard in self.shards if shard["Records"]
+            }
+
+    def pending(self):
+        """Total number of records stored, used by the replay harness"""
+        with self._lock:
+            return sum(len(shard["Records"]) for shard in self.shards)
+
+
+class _Body:
+    def __init__(self, data):
+        self._stream = io.BytesIO(data)
+
+    def read(self, amt=None):
+        return self._stream.read() if amt is None else self._stream.read(amt)
+
+
+class LocalS3:
+    """In-process stand-in for S3, in memory or under a local directory"""
+
+    def __init__(self, root=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.root = root
+        self._lock = threading.Lock()
+        self._objects = {}
+
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket or "bucket", key)
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        if hasattr(Body, "read"):
+            Body = Body.read()
+        data = bytes(Body)
+        if self.root:
+            path = self._path(Bucket, Key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+        with self._lock:
+            self._objects[(Bucket, Key)] = (len(data), time.time(), None if self.root else data)
+        return {"ETag": hashlib.md5(data).hexdigest()}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, **kwargs):
+        self.put_object(Bucket=Bucket, Key=Key, Body=Fileobj)
+
+    def get_object(self, Bucket, Key, **kwargs):
+        if self.root:
+            with open(self._path(Bucket, Key), "rb") as f:
+                return {"Body": _Body(f.read())}
+        with self._lock:
+            return {"Body": _Body(self._objects[(Bucket, Key)][2])}
+
+    def list_objects_v2(self, Bucket, Prefix="", **kwargs):
+        with self._lock:
+            contents = [
+                {
+                    "Key": key,
+                    "Size": size,
+                    "LastModified": datetime.datetime.fromtimestamp(
+                        modified, datetime.timezone.utc),
+                }
+                for (bucket, key), (size, modified, _) in sorted(self._objects.items())
+                if bucket == Bucket and key.startswith(Prefix)
+            ]
+        return {"Contents": contents, "KeyCount": len(contents), "IsTruncated": False}
+
+    def get_paginator(self, operation_name):
+        s3 = self
+
+        class Paginator:
+            def paginate(self, **kwargs):
+                yield getattr(s3, operation_name)(**kwargs)
+
+        return Paginator()
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        for obj in Delete["Objects"]:
+            with self._lock:
+                self._objects.pop((Bucket, obj["Key"]), None)
+            if self.root and os.path.exists(self._path(Bucket, obj["Key"])):
+                os.remove(self._path(Bucket, obj["Key"]))
+        return {"Deleted": Delete["Objects"]}
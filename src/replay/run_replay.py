@@ -0,0 +1,90 @@
+import argparse
+import asyncio
+import logging
+import os
+import threading
+import time
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+def delivered_rows(s3, bucket, prefixes):
+    """Rows in the Parquet objects under `prefixes`"""
+    rows = 0
+    for prefix in prefixes:
+        for obj in s3.list_objects_v2(Bucket=bucket, Prefix=prefix).get("Contents", []):
+            body = s3.get_object(Bucket=bucket, Key=obj["Key"])["Body"].read()
+            rows += pq.ParquetFile(pa.BufferReader(body)).metadata.num_rows
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay recorded frames through producer, consumer and save_to_s3 offline")
+    parser.add_argument("path", help="gzip file written by FrameRecorder")
+    parser.add_argument("--speed", default="1", help="1, 10, 100, ... or max")
+    parser.add_argument("--shards", type=int, default=1, help="local Kinesis shards")
+    parser.add_argument("--timeout", type=float, default=300,
+                        help="seconds to wait for the consumer to catch up")
+    parser.add_argument("--throttle", default="none", choices=["none", "conflate", "sleep"],
+                        help="producer THROTTLE_MODE; \"none\" publishes every frame, "
+                             "the others measure the production throttle instead")
+    args = parser.parse_args()
+
+    # Must be set before the pipeline creates its clients
+    os.environ.setdefault("AWS_BACKEND", "local")
+    os.environ.setdefault("SHARD_ITERATOR_TYPE", "TRIM_HORIZON")
+    os.environ["LOCAL_KINESIS_SHARDS"] = str(args.shards)
+    os.environ["THROTTLE_MODE"] = args.throttle
+
+    from src.aws_clients import get_client
+    from src.kinesis.kinesis_producer import KinesisProducer
+    from src.replay.frame_replayer import FrameReplayer
+    from src.transfom.lambda_consume import LambdaConsume
+
+    producer = KinesisProducer()
+    consumer = LambdaConsume()
+    replayer = FrameReplayer(args.path, args.speed)
+    kinesis = get_client("kinesis")
+
+    consumer_thread = threading.Thread(
+        target=consumer.stream_kinesis_records, name="Consumer", daemon=True)
+    consumer_thread.start()
+
+    start = time.monotonic()
+    asyncio.run(producer.start_publish(sources=[replayer.replay(producer)]))
+
+    # Wait until every shard is read up to its last record
+    deadline = time.monotonic() + args.timeout
+    while time.monotonic() < deadline:
+        latest = kinesis.latest_sequence_numbers()
+        if all(consumer.get_position(shard_id) == sequence
+               for shard_id, sequence in latest.items()):
+            break
+        time.sleep(0.1)
+    consumer.stop()
+    consumer_thread.join()
+    elapsed = time.monotonic() - start
+
+    s3 = get_client("s3")
+    objects = s3.list_objects_v2(Bucket=consumer.bucket)["Contents"]
+    published = producer.events_published.value
+    # Ticker rows sit under PROJECT_NAME/, other event types under PROJECT_NAME_<table>/
+    delivered = delivered_rows(s3, consumer.bucket, [f"{consumer.PROJECT_NAME}/"] + [
+        f"{consumer.PROJECT_NAME}_{spec.table}/" for spec in consumer.event_types])
+    logging.info(
+        f"📊 {replayer.count} frames replayed | {published} events published in "
+        f"{kinesis.pending()} Kinesis records | {delivered} events delivered to "
+        f"{len(objects)} S3 objects, {sum(o['Size'] for o in objects)} bytes")
+    # Throughput counts what reached S3, not what was handed to the producer
+    logging.info(
+        f"📊 {elapsed:.2f}s end to end, {delivered / (elapsed or 1):.0f} events/s delivered "
+        f"(throttle {args.throttle})")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    main()
@@ -5,6 +5,10 @@ from src.transfom.lambda_consume import LambdaConsume
 from concurrent.futures import ThreadPoolExecutor, wait
 import asyncio
 import logging
+import os
+import signal
+import threading
+import time
 
 
 # Main class to orchestrate the entire streaming process.
@@ -16,31 +20,96 @@ class RunStreaming:
             format="[%(asctime)s] %(name)s - %(levelname)s - %(message)s",
             datefmt="%Y-%m-%d %H:%M:%S",
         )
+        self.logger = logging.getLogger(self.__class__.__name__)
+        # Seconds before a failed component is restarted, doubling up to the max
+        self.RESTART_BACKOFF = float(os.getenv("RESTART_BACKOFF", 1))
+        self.MAX_RESTART_BACKOFF = float(os.getenv("MAX_RESTART_BACKOFF", 60))
+        self._stop_event = threading.Event()
+        # One top-coins request, shared with the producer
         self.topic_creator = TopicCreator()
-        self.producer = KinesisProducer()
+        self.producer = KinesisProducer(topic_creator=self.topic_creator)
         self.consumer = LambdaConsume()
         # Initialize various components needed for the streaming pipeline.
         self.athena = AthenaCreator()
 
     @staticmethod
     def run_async_producer(producer):
-        # Static method to run the Kafka producer's asynchronous publishing process.
+        # Static method to run the Kinesis producer's asynchronous publishing process.
         asyncio.run(producer.start_publish())
 
+    def run_producer(self):
+        self.run_async_producer(self.producer)
+
+    def run_consumer(self):
+        self.consumer.stream_kinesis_records()
+
+    def run_catalog(self):
+        if not self.athena.run_athena():
+            raise RuntimeError("Athena catalog setup did not complete")
+
+    def restart_producer(self):
+        self.producer = KinesisProducer(topic_creator=self.topic_creator)
+
+    def restart_consumer(self):
+        # Resumes from the checkpoint store, the failed instance flushed on exit
+        self.consumer = LambdaConsume()
+
+    def supervise(self, name, run, restart=None, once=False):
+        """Run a component until stopped, restarting it with backoff.
+
+        `once` components (catalog setup) stop after their first success;
+        the others are restarted even when they return, since they are
+        meant to run until shutdown.
+        """
+        backoff = self.RESTART_BACKOFF
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                run()
+                if once or self._stop_event.is_set():
+                    return
+                self.logger.warning(f"⚠️ {name} exited unexpectedly")
+            except Exception as e:
+                self.logger.error(f"❌ {name} failed: {e}")
+            if time.monotonic() - started > self.MAX_RESTART_BACKOFF:
+                # It ran fine for a while, start over from a short backoff
+                backoff = self.RESTART_BACKOFF
+            self.logger.info(f"🔄 Restarting {name} in {backoff:.0f}s...")
+            if self._stop_event.wait(backoff):
+                return
+            backoff = min(backoff * 2, self.MAX_RESTART_BACKOFF)
+            if restart is not None:
+                restart()
+
+    def stop(self, signum=None, frame=None):
+        """Stop ingestion; producer and consumer drain their buffers first"""
+        if self._stop_event.is_set():
+            return
+        self.logger.info("🛑 Shutting down, draining buffers to Kinesis and S3...")
+        self._stop_event.set()
+        self.topic_creator.stop()
+        self.producer.stop()
+        self.consumer.stop()
+
     def run(self):
         # Main method to start all parts of the streaming application
-        # Create Athena DB and tables after Spark might have written some data.
-        self.athena.run_athena()
-        # Run producer + Spark pipelines concurrently
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            # Submit Kafka producer and Spark streaming pipelines to run in parallel.
-            producer_future = executor.submit(
-                self.run_async_producer, self.producer)
-
-            ticker_pipeline_future = executor.submit(
-                self.consumer.stream_kinesis_records())
-
-            wait([producer_future, ticker_pipeline_future])
+        # Catalog DDL, producer and consumer start together, so ingestion
+        # does not wait for Athena
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [
+                executor.submit(self.supervise, "Athena catalog", self.run_catalog, once=True),
+                executor.submit(self.supervise, "Kinesis producer", self.run_producer,
+                                self.restart_producer),
+                executor.submit(self.supervise, "Kinesis consumer", self.run_consumer,
+                                self.restart_consumer),
+            ]
+            # Wake up regularly so signal handlers run in the main thread
+            while wait(futures, timeout=1).not_done:
+                pass
+        self.logger.info("✅ All components stopped")
 
 
 if __name__ == "__main__":
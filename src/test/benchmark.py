@@ -0,0 +1,230 @@
+"""Benchmark the pipeline hot paths against a committed baseline.
+
+    python -m src.test.benchmark                    # compare, exit 1 on regression
+    python -m src.test.benchmark --update-baseline  # record a new baseline
+
+benchmark_baseline.json was recorded on one development machine; timings
+from another machine are not comparable, so record a baseline there first
+with --update-baseline and compare against that.
+"""
+import argparse
+import base64
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "benchmark_baseline.json")
+SIZES = [100, 1000, 10000, 100000]
+# Everything LambdaConsume and the publishers need, so the suite runs out of the box
+BENCHMARK_ENV = {
+    "AWS_BACKEND": "local",
+    "PROJECT_NAME": "benchmark",
+    "S3_BUCKET_NAME": "benchmark",
+    "STREAM_NAME": "benchmark",
+    "CHECKPOINT_BACKEND": "none",
+    "COMPACTION_INTERVAL": "0",
+    "METRICS_PORT": "0",
+}
+SYMBOLS = ["BTCUSDT", "ETHUSDT", "BNBUSDT", "SOLUSDT", "XRPUSDT",
+           "DOGEUSDT", "ADAUSDT", "TRXUSDT", "LINKUSDT", "AVAXUSDT"]
+
+
+def make_payload(i, now_ms):
+    """Synthetic Binance 24hr ticker event"""
+    price = 100 + random.random() * 10
+    return {
+        "e": "24hrTicker", "E": now_ms + i, "s": SYMBOLS[i % len(SYMBOLS)],
+        "p": f"{random.uniform(-5, 5):.8f}", "P": f"{random.uniform(-3, 3):.3f}",
+        "w": f"{price:.8f}", "x": f"{price:.8f}", "c": f"{price:.8f}",
+        "Q": f"{random.random():.8f}", "b": f"{price - 0.01:.8f}", "B": "1.00000000",
+        "a": f"{price + 0.01:.8f}", "A": "1.00000000", "o": f"{price:.8f}",
+        "h": f"{price + 1:.8f}", "l": f"{price - 1:.8f}", "v": "12345.00000000",
+        "q": "1234567.00000000", "O": now_ms - 86400000, "C": now_ms + i,
+        "F": 1000 + i, "L": 2000 + i, "n": 1000,
+    }
+
+
+def make_payloads(size):
+    now_ms = int(time.time() * 1000)
+    # WebSocket frames as the producer sends them (WIRE_FORMAT "raw")
+    return [json.dumps(make_payload(i, now_ms)).encode("utf-8") for i in range(size)]
+
+
+def make_records(size):
+    return [
+        {"kinesis": {"data": base64.b64encode(payload).decode("utf-8")}}
+        for payload in make_payloads(size)
+    ]
+
+
+def setup_case(case, size):
+    """Build the inputs of a case and return a zero-argument callable"""
+    for name, value in BENCHMARK_ENV.items():
+        os.environ.setdefault(name, value)
+    from src.replay.local_aws import LocalKinesis
+    from src.transfom.transformer import Transformer
+    from src.transfom.lambda_consume import LambdaConsume
+    from src.transfom.deduplicator import Deduplicator
+    from src.kinesis.batch_publisher import BatchPublisher
+    from src.kinesis.record_codec import RecordAggregator
+
+    if case == "transform_arrow":
+        transformer, records = Transformer(), make_records(size)
+        return lambda: transformer.transform_data_arrow(records)
+    if case == "transform_pandas":
+        transformer, records = Transformer(), make_records(size)
+        return lambda: transformer.transform_data(records)
+    if case == "normalize_data":
+        import pandas as pd
+        transformer = Transformer()
+        rows = [json.loads(payload) for payload in make_payloads(size)]
+        return lambda: transformer.normalize_data(pd.DataFrame(rows))
+    if case == "parquet_encode":
+        consumer = LambdaConsume()
+        table = consumer.transformer.transform_data_arrow(make_records(size))
+        return lambda: consumer.save_to_s3(table)
+    if case == "producer_batching":
+        payloads = make_payloads(size)
+
+        def publish():
+            publisher = BatchPublisher(LocalKinesis(), "benchmark", linger_ms=1000)
+            for i, payload in enumerate(payloads):
+                publisher.add(payload, SYMBOLS[i % len(SYMBOLS)])
+            publisher.flush()
+        return publish
+    if case == "producer_aggregation":
+        # Frames packed into KPL aggregated records
+        payloads = make_payloads(size)
+
+        def publish_aggregated():
+            publisher = BatchPublisher(LocalKinesis(), "benchmark", max_records=10000,
+                                       linger_ms=1000, aggregator=RecordAggregator("kpl"))
+            for i, payload in enumerate(payloads):
+                publisher.add(payload, SYMBOLS[i % len(SYMBOLS)])
+            publisher.flush()
+        return publish_aggregated
+    if case == "consume_loop":
+        consumer = LambdaConsume()
+        payloads = make_payloads(size)
+
+        def consume():
+            if consumer.dedup is not None:
+                # Every run replays the same records, they must not count as duplicates
+                consumer.dedup = Deduplicator()
+            kinesis = LocalKinesis()
+            kinesis.put_records(StreamName="benchmark", Records=[
+                {"Data": payload, "PartitionKey": "benchmark"} for payload in payloads])
+            iterator = kinesis.get_shard_iterator(
+                StreamName="benchmark", ShardId=kinesis.shards[0]["ShardId"],
+                ShardIteratorType="TRIM_HORIZON")["ShardIterator"]
+            while True:
+                response = kinesis.get_records(ShardIterator=iterator, Limit=10000)
+                if not response["Records"]:
+                    break
+                consumer.handle_event(consumer.to_event(response["Records"]))
+                iterator = response["NextShardIterator"]
+            consumer.buffer.flush()
+        return consume
+    raise ValueError(f"Unknown case {case}")
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_case(case, size, repeat):
+    """Runs in a fresh process so the RSS high-water mark is this case's"""
+    logging.disable(logging.CRITICAL)
+    func = setup_case(case, size)
+    # Imports and inputs are not the case's working memory
+    setup_rss = peak_rss_mb()
+    func()  # warm up
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    p99_index = min(len(durations) - 1, int(round(0.99 * (len(durations) - 1))))
+    return {
+        "records_per_sec": size / statistics.median(durations),
+        "p50_ms": statistics.median(durations) * 1000,
+        "p99_ms": durations[p99_index] * 1000,
+        # Growth of peak RSS over the setup, i.e. the memory one call needs
+        "peak_rss_delta_mb": peak_rss_mb() - setup_rss,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return the list of regressions beyond `threshold` (0.2 = 20%)"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["records_per_sec"] < base["records_per_sec"] * (1 - threshold):
+            regressions.append(f"{name}: records/sec {result['records_per_sec']:.0f} < {base['records_per_sec']:.0f}")
+        if result["p99_ms"] > base["p99_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p99 {result['p99_ms']:.1f} ms > {base['p99_ms']:.1f} ms")
+        # 2 MB of slack, small cases stay within allocator noise
+        if result["peak_rss_delta_mb"] > base["peak_rss_delta_mb"] * (1 + threshold) + 2:
+            regressions.append(
+                f"{name}: peak RSS delta {result['peak_rss_delta_mb']:.1f} MB > "
+                f"{base['peak_rss_delta_mb']:.1f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline hot paths")
+    parser.add_argument("--cases", default="transform_arrow,transform_pandas,normalize_data,"
+                        "parquet_encode,producer_batching,producer_aggregation,consume_loop")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in SIZES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = {}
+    for case in args.cases.split(","):
+        for size in [int(size) for size in args.sizes.split(",")]:
+            name = f"{case}[{size}]"
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                results[name] = pool.submit(run_case, case, size, args.repeat).result()
+            result = results[name]
+            logging.info(
+                f"📊 {name:28} {result['records_per_sec']:>12.0f} rec/s | "
+                f"p50 {result['p50_ms']:8.1f} ms | p99 {result['p99_ms']:8.1f} ms | "
+                f"peak RSS +{result['peak_rss_delta_mb']:7.1f} MB")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        logging.info(f"✅ Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        # Nothing to compare against is a failure, not a pass
+        logging.error(f"❌ No baseline at {args.baseline}, run with --update-baseline")
+        return 1
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.threshold)
+    for regression in regressions:
+        logging.error(f"❌ Regression {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    sys.exit(main())
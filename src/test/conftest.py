@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+
+def _ticker(i, symbol="BTCUSDT", **overrides):
+    payload = {
+        "e": "24hrTicker", "E": 1700000000000 + i, "s": symbol,
+        "p": "1.00000000", "P": "0.100", "w": "100.00000000", "x": "99.00000000",
+        "c": "100.00000000", "Q": "0.50000000", "b": "99.99000000", "B": "1.00000000",
+        "a": "100.01000000", "A": "1.00000000", "o": "99.00000000", "h": "101.00000000",
+        "l": "98.00000000", "v": "12345.00000000", "q": "1234567.00000000",
+        "O": 1699913600000 + i, "C": 1700000000000 + i, "F": 1000 + i, "L": 2000 + i,
+        "n": 1000,
+    }
+    payload.update(overrides)
+    return json.dumps(payload).encode("utf-8")
+
+
+@pytest.fixture
+def ticker():
+    """ticker(i, symbol=..., **fields) -> 24hr ticker frame as the producer sends it"""
+    return _ticker
+
+
+@pytest.fixture
+def consumer_env(monkeypatch, tmp_path):
+    """Settings for a LambdaConsume against the in-process Kinesis and S3"""
+    for name, value in {
+        "AWS_BACKEND": "local",
+        "PROJECT_NAME": "test",
+        "S3_BUCKET_NAME": "test",
+        "STREAM_NAME": "test",
+        "STREAM_TYPES": "ticker",
+        "CHECKPOINT_BACKEND": "none",
+        "CHECKPOINT_PATH": str(tmp_path / "checkpoints.sqlite"),
+        "COMPACTION_INTERVAL": "0",
+        "SNAPSHOT_INTERVAL": "0",
+        "BAR_INTERVALS": "",
+        "DECODE_WORKERS": "0",
+        "METRICS_PORT": "0",
+    }.items():
+        monkeypatch.setenv(name, value)
@@ -0,0 +1,70 @@
+import pyarrow as pa
+
+from src.transfom.bar_aggregator import BAR_SCHEMA, BarAggregator, parse_interval
+
+
+def ticks(*events):
+    """(symbol, event_time ms, price, qty, trade_id) -> ticker-like table"""
+    symbols, times, prices, qtys, ids = zip(*events)
+    return pa.table({
+        "symbol": pa.array(symbols, pa.string()),
+        "event_time": pa.array(times, pa.timestamp("ms")),
+        "last_price": pa.array(prices, pa.float64()),
+        "last_qty": pa.array(qtys, pa.float64()),
+        "last_trade_id": pa.array(ids, pa.int64()),
+    })
+
+
+def test_parse_interval():
+    assert parse_interval("1s") == 1000
+    assert parse_interval("5m") == 300000
+    assert parse_interval("1h") == 3600000
+
+
+def test_bar_closes_once_the_watermark_passes_its_end():
+    bars = BarAggregator(["1m"], watermark_ms=2000)
+    assert bars.update(ticks(
+        ("BTCUSDT", 1000, 100.0, 1.0, 10),
+        ("BTCUSDT", 30000, 105.0, 1.0, 11),
+        ("BTCUSDT", 20000, 95.0, 2.0, 12),
+        ("BTCUSDT", 59000, 101.0, 1.0, 13),
+    )).num_rows == 0
+    # 61s is not yet past 60s + 2s watermark
+    assert bars.update(ticks(("BTCUSDT", 61000, 102.0, 1.0, 14))).num_rows == 0
+
+    closed = bars.update(ticks(("BTCUSDT", 62000, 103.0, 1.0, 15)))
+    assert closed.schema == BAR_SCHEMA
+    bar = closed.to_pylist()[0]
+    assert (bar["open"], bar["high"], bar["low"], bar["close"]) == (100.0, 105.0, 95.0, 101.0)
+    assert bar["sampled_volume"] == 5.0
+    assert bar["sampled_vwap"] == (100.0 + 105.0 + 95.0 * 2 + 101.0) / 5
+    assert bar["trade_count"] == 4
+    assert bar["event_count"] == 4
+
+
+def test_events_of_an_emitted_bar_are_late():
+    bars = BarAggregator(["1m"], watermark_ms=2000)
+    bars.update(ticks(("BTCUSDT", 1000, 100.0, 1.0, 1), ("BTCUSDT", 62000, 101.0, 1.0, 2)))
+    assert bars.update(ticks(("BTCUSDT", 2000, 99.0, 1.0, 3))).num_rows == 0
+    assert bars.late_events == 1
+
+
+def test_idle_symbols_close_on_event_time():
+    bars = BarAggregator(["1m"], watermark_ms=2000)
+    bars.update(ticks(("ETHUSDT", 1000, 10.0, 1.0, 1)))
+    # Wall-clock time is irrelevant, only other symbols move the clock
+    assert bars.close_idle(60000).num_rows == 0
+
+    bars.update(ticks(("BTCUSDT", 125000, 100.0, 1.0, 1)))
+    closed = bars.close_idle(60000)
+    assert closed.column("symbol").to_pylist() == ["ETHUSDT"]
+    # The idle bar is closed, a straggler for it is late instead of reopening it
+    bars.update(ticks(("ETHUSDT", 2000, 11.0, 1.0, 2)))
+    assert bars.late_events == 1
+
+
+def test_each_interval_gets_its_bars():
+    bars = BarAggregator(["1m", "5m"], watermark_ms=0)
+    bars.update(ticks(("BTCUSDT", 1000, 100.0, 1.0, 1)))
+    closed = bars.update(ticks(("BTCUSDT", 300000, 101.0, 1.0, 2)))
+    assert sorted(closed.column("bar_interval").to_pylist()) == ["1m", "5m"]
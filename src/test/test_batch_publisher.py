@@ -0,0 +1,106 @@
+from src.kinesis.batch_publisher import BatchPublisher
+from src.kinesis.record_codec import RecordAggregator, decode_record
+
+
+class FlakyKinesis:
+    """put_records that fails the entries listed in `failures`, call by call.
+
+    `failures` holds, per call, the indexes of the entries to reject, or
+    "raise" to fail the whole call.
+    """
+
+    def __init__(self, failures):
+        self.failures = list(failures)
+        self.calls = []
+        self.stored = []
+
+    def put_records(self, StreamName, Records):
+        self.calls.append([record["Data"] for record in Records])
+        failing = self.failures.pop(0) if self.failures else ()
+        if failing == "raise":
+            raise ConnectionError("connection reset")
+        results = []
+        for i, record in enumerate(Records):
+            if i in failing:
+                results.append({"ErrorCode": "ProvisionedThroughputExceededException"})
+            else:
+                self.stored.append(record["Data"])
+                results.append({"SequenceNumber": str(len(self.stored)), "ShardId": "shardId-0"})
+        return {"FailedRecordCount": len(failing), "Records": results}
+
+
+def publisher(kinesis, **kwargs):
+    acked = []
+    kwargs.setdefault("linger_ms", 10000)
+    return BatchPublisher(kinesis, "test", retry_backoff=0, on_sent=acked.extend, **kwargs), acked
+
+
+def test_only_failed_records_are_retried():
+    kinesis = FlakyKinesis([{1, 3}])
+    batch, acked = publisher(kinesis)
+    for i in range(5):
+        batch.add(b"%d" % i, "key")
+    batch.flush()
+
+    assert kinesis.calls == [[b"0", b"1", b"2", b"3", b"4"], [b"1", b"3"]]
+    assert sorted(kinesis.stored) == [b"0", b"1", b"2", b"3", b"4"]
+    assert len(acked) == 5
+    stats = batch.get_stats()
+    assert stats["events_sent"] == 5
+    assert stats["events_retried"] == 2
+    assert stats["events_dropped"] == 0
+    assert stats["calls"] == 2
+    assert stats["records_put"] == 7
+
+
+def test_failed_call_is_retried_whole():
+    kinesis = FlakyKinesis(["raise"])
+    batch, acked = publisher(kinesis)
+    batch.add(b"a", "key")
+    batch.add(b"b", "key")
+    batch.flush()
+
+    assert kinesis.stored == [b"a", b"b"]
+    assert batch.get_stats()["events_retried"] == 2
+
+
+def test_records_are_dropped_after_max_retries():
+    kinesis = FlakyKinesis([{0}, {0}, {0}])
+    batch, acked = publisher(kinesis, max_retries=2)
+    batch.add(b"lost", "key")
+    batch.add(b"kept", "key")
+    batch.flush()
+
+    assert kinesis.stored == [b"kept"]
+    assert [entry["Data"] for entry in acked] == [b"kept"]
+    stats = batch.get_stats()
+    assert stats["events_dropped"] == 1
+    assert stats["events_sent"] == 1
+    assert stats["calls"] == 3
+
+
+def test_batch_is_flushed_at_max_records():
+    kinesis = FlakyKinesis([])
+    batch, _ = publisher(kinesis, max_records=2)
+    for i in range(5):
+        batch.add(b"%d" % i, "key")
+    assert kinesis.calls == [[b"0", b"1"], [b"2", b"3"]]
+    batch.flush()
+    assert kinesis.calls[-1] == [b"4"]
+
+
+def test_aggregated_retry_resends_the_whole_aggregate():
+    kinesis = FlakyKinesis([{0}])
+    batch, acked = publisher(kinesis, max_records=1000, aggregator=RecordAggregator("kpl"))
+    for i in range(100):
+        batch.add(b"%d" % i, "key")
+    batch.flush()
+
+    assert len(kinesis.calls) == 2
+    assert decode_record(kinesis.stored[0]) == [b"%d" % i for i in range(100)]
+    assert len(acked) == 100
+    stats = batch.get_stats()
+    assert stats["events_sent"] == 100
+    assert stats["kinesis_records"] == 1
+    assert stats["events_per_call"] == 50
+    assert stats["records_per_call"] == 1
@@ -0,0 +1,70 @@
+import json
+
+from src.replay.local_aws import LocalKinesis
+from src.transfom.lambda_consume import LambdaConsume
+
+
+def put_tickers(kinesis, ticker, start, count):
+    kinesis.put_records(StreamName="test", Records=[
+        {"Data": ticker(i), "PartitionKey": "test"} for i in range(start, start + count)
+    ])
+
+
+def read_all(kinesis, shard_id):
+    iterator = kinesis.get_shard_iterator(
+        StreamName="test", ShardId=shard_id, ShardIteratorType="TRIM_HORIZON")["ShardIterator"]
+    return kinesis.get_records(ShardIterator=iterator, Limit=10000)["Records"]
+
+
+def test_restart_resumes_after_committed_flush(consumer_env, ticker, monkeypatch):
+    monkeypatch.setenv("CHECKPOINT_BACKEND", "sqlite")
+    kinesis = LocalKinesis()
+    shard_id = kinesis.list_shards(StreamName="test")["Shards"][0]["ShardId"]
+    put_tickers(kinesis, ticker, 0, 20)
+    records = read_all(kinesis, shard_id)
+    committed = records[-1]["SequenceNumber"]
+
+    consumer = LambdaConsume()
+    consumer.handle_event(consumer.to_event(records), shard_id, committed)
+    consumer.buffer.flush()
+    consumer.checkpoint_store.close()
+
+    # Records that arrive after the commit are the only ones left to read
+    put_tickers(kinesis, ticker, 20, 5)
+    restarted = LambdaConsume()
+    calls = []
+    get_shard_iterator = kinesis.get_shard_iterator
+
+    def spy(**params):
+        calls.append(params)
+        # Stop before the first fetch, only the starting position matters
+        restarted.stop()
+        return get_shard_iterator(**params)
+
+    kinesis.get_shard_iterator = spy
+    restarted.read_shard(kinesis, shard_id, "TRIM_HORIZON")
+    restarted.checkpoint_store.close()
+
+    assert calls == [{
+        "StreamName": "test",
+        "ShardId": shard_id,
+        "ShardIteratorType": "AFTER_SEQUENCE_NUMBER",
+        "StartingSequenceNumber": committed,
+    }]
+    resumed = get_shard_iterator(**calls[0])["ShardIterator"]
+    remaining = kinesis.get_records(ShardIterator=resumed, Limit=10000)["Records"]
+    assert [json.loads(r["Data"])["F"] for r in remaining] == [1020, 1021, 1022, 1023, 1024]
+
+
+def test_no_commit_without_flush(consumer_env, ticker, monkeypatch):
+    monkeypatch.setenv("CHECKPOINT_BACKEND", "sqlite")
+    kinesis = LocalKinesis()
+    shard_id = kinesis.list_shards(StreamName="test")["Shards"][0]["ShardId"]
+    put_tickers(kinesis, ticker, 0, 5)
+    records = read_all(kinesis, shard_id)
+
+    consumer = LambdaConsume()
+    consumer.handle_event(consumer.to_event(records), shard_id, records[-1]["SequenceNumber"])
+    # Rows still buffered, nothing in S3 yet: the checkpoint must not move
+    assert consumer.checkpoint_store.get_checkpoint(shard_id) is None
+    consumer.checkpoint_store.close()
@@ -0,0 +1,58 @@
+import pyarrow as pa
+
+from src.transfom.deduplicator import Deduplicator
+
+
+def rows(*events):
+    """(symbol, event_time ms, last_trade_id) -> ticker-like table"""
+    symbols, times, ids = zip(*events)
+    return pa.table({
+        "symbol": pa.array(symbols, pa.string()),
+        "event_time": pa.array(times, pa.timestamp("ms")),
+        "last_trade_id": pa.array(ids, pa.int64()),
+    })
+
+
+def kept(table):
+    return list(zip(table.column("symbol").to_pylist(),
+                    table.column("event_time").cast(pa.int64()).to_pylist(),
+                    table.column("last_trade_id").to_pylist()))
+
+
+def test_in_order_rows_all_pass():
+    dedup = Deduplicator()
+    batch = rows(("BTCUSDT", 1000, 1), ("ETHUSDT", 1000, 1), ("BTCUSDT", 2000, 2))
+    assert dedup.filter(batch).equals(batch)
+    assert dedup.get_stats()["duplicates"] == 0
+
+
+def test_replayed_batch_is_dropped():
+    dedup = Deduplicator()
+    batch = rows(("BTCUSDT", 1000, 1), ("BTCUSDT", 2000, 2))
+    dedup.filter(batch)
+    assert dedup.filter(batch).num_rows == 0
+    assert dedup.get_stats()["duplicates"] == 2
+
+
+def test_duplicates_inside_a_batch_keep_the_first():
+    dedup = Deduplicator()
+    batch = rows(("BTCUSDT", 1000, 1), ("BTCUSDT", 1000, 1), ("BTCUSDT", 1000, 2))
+    assert kept(dedup.filter(batch)) == [("BTCUSDT", 1000, 1), ("BTCUSDT", 1000, 2)]
+
+
+def test_late_new_row_passes_late_duplicate_does_not():
+    dedup = Deduplicator()
+    dedup.filter(rows(("BTCUSDT", 1000, 1), ("BTCUSDT", 5000, 5)))
+    late = rows(("BTCUSDT", 3000, 3), ("BTCUSDT", 1000, 1))
+    assert kept(dedup.filter(late)) == [("BTCUSDT", 3000, 3)]
+
+
+def test_rows_older_than_retention_pass_unchecked():
+    dedup = Deduplicator(retention_ms=60000, bucket_ms=10000)
+    dedup.filter(rows(("BTCUSDT", 1000, 1)))
+    dedup.filter(rows(("BTCUSDT", 200000, 2)))
+    # Its bucket was dropped, the repeat cannot be recognised any more
+    assert dedup.filter(rows(("BTCUSDT", 1000, 1))).num_rows == 1
+    stats = dedup.get_stats()
+    assert stats["unchecked"] == 1
+    assert stats["buckets"] == 1
@@ -0,0 +1,64 @@
+from src.transfom.fetch_scheduler import FetchScheduler
+
+
+def scheduler(**kwargs):
+    kwargs.setdefault("min_limit", 100)
+    kwargs.setdefault("max_limit", 1000)
+    kwargs.setdefault("idle_delay", 1.0)
+    kwargs.setdefault("max_idle_delay", 4.0)
+    return FetchScheduler(**kwargs)
+
+
+def test_limit_grows_while_behind_and_calls_go_back_to_back():
+    fetch = scheduler()
+    limits = []
+    for _ in range(5):
+        limits.append(fetch.before_fetch())
+        # Only the per-shard 5 calls/second spacing is left
+        assert fetch.after_fetch(fetch.limit, millis_behind=60000) <= FetchScheduler.MIN_INTERVAL
+    assert limits == [100, 200, 400, 800, 1000]
+
+
+def test_limit_shrinks_once_caught_up():
+    fetch = scheduler()
+    for _ in range(3):
+        fetch.before_fetch()
+        fetch.after_fetch(fetch.limit, millis_behind=60000)
+    assert fetch.limit == 800
+    fetch.before_fetch()
+    assert fetch.after_fetch(10, millis_behind=0) == 1.0
+    assert fetch.limit == 400
+
+
+def test_empty_polls_back_off_to_the_max_idle_delay():
+    fetch = scheduler()
+    delays = []
+    for _ in range(4):
+        fetch.before_fetch()
+        delays.append(fetch.after_fetch(0))
+    assert delays == [1.0, 2.0, 4.0, 4.0]
+    # Records again: back to the short delay
+    fetch.before_fetch()
+    assert fetch.after_fetch(5) == 1.0
+
+
+def test_throttling_shrinks_the_limit_and_waits_with_jitter():
+    fetch = scheduler(throttle_backoff=0.5, max_throttle_backoff=2.0)
+    fetch.limit = 800
+    waits = [fetch.throttled() for _ in range(4)]
+    assert fetch.limit == 100
+    for wait, cap in zip(waits, [0.5, 1.0, 2.0, 2.0]):
+        assert 0 <= wait <= cap
+
+
+def test_fixed_schedule_without_adaptation():
+    fetch = scheduler(adaptive=False)
+    fetch.before_fetch()
+    assert fetch.after_fetch(fetch.limit, millis_behind=60000) == 1.0
+    assert fetch.limit == 100
+
+
+def test_limits_are_clamped_to_kinesis():
+    fetch = FetchScheduler(min_limit=0, max_limit=50000)
+    assert fetch.min_limit == 1
+    assert fetch.max_limit == FetchScheduler.MAX_LIMIT
@@ -0,0 +1,60 @@
+import pytest
+
+from src.kinesis.record_codec import (
+    COMPRESSIONS, KPL_MAGIC, RecordAggregator, decode_record, encode_framed, encode_kpl,
+)
+
+PAYLOADS = [b'{"e":"trade","t":%d}' % i for i in range(50)] + [b"", b"x" * 300]
+
+
+def test_kpl_round_trip():
+    record = encode_kpl(("btcusdt", None, payload) for payload in PAYLOADS)
+    assert record.startswith(KPL_MAGIC)
+    assert decode_record(record) == PAYLOADS
+
+
+def test_kpl_keeps_partition_and_hash_keys_per_entry():
+    entries = [("btcusdt", "1", b"a"), ("ethusdt", None, b"b"), ("btcusdt", "1", b"c")]
+    assert decode_record(encode_kpl(entries)) == [b"a", b"b", b"c"]
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_framed_round_trip(compression):
+    assert decode_record(encode_framed(PAYLOADS, compression)) == PAYLOADS
+
+
+def test_plain_record_is_one_payload():
+    assert decode_record(b'{"e":"24hrTicker"}') == [b'{"e":"24hrTicker"}']
+
+
+def test_corrupt_kpl_record_is_passed_through():
+    record = bytearray(encode_kpl([("btcusdt", None, b'{"e":"trade"}')]))
+    record[10] ^= 0xFF
+    # The MD5 check fails, so the bytes are not an aggregate after all
+    assert decode_record(bytes(record)) == [bytes(record)]
+
+
+def test_aggregator_groups_by_shard_key_and_cuts_at_max_bytes():
+    entries = [
+        {"Data": b"x" * 100, "PartitionKey": "btcusdt", "ExplicitHashKey": "1"},
+        {"Data": b"y" * 100, "PartitionKey": "ethusdt"},
+        {"Data": b"z" * 100, "PartitionKey": "solusdt", "ExplicitHashKey": "1"},
+        {"Data": b"w" * 100, "PartitionKey": "ethusdt"},
+    ]
+    records = RecordAggregator("kpl", max_bytes=250).aggregate(entries)
+    carried = [[entry["Data"] for entry in chunk] for _, chunk in records]
+    assert carried == [[b"x" * 100, b"z" * 100], [b"y" * 100, b"w" * 100]]
+    for record, chunk in records:
+        assert decode_record(record["Data"]) == [entry["Data"] for entry in chunk]
+    assert records[0][0]["ExplicitHashKey"] == "1"
+    assert "ExplicitHashKey" not in records[1][0]
+
+    assert len(RecordAggregator("kpl", max_bytes=150).aggregate(entries)) == 4
+
+
+@pytest.mark.parametrize("wire_format, compression", [
+    ("protobuf", "none"), ("framed", "gzip"), ("kpl", "zlib"),
+])
+def test_aggregator_rejects_bad_settings(wire_format, compression):
+    with pytest.raises(ValueError):
+        RecordAggregator(wire_format, compression)
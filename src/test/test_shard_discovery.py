@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+
+from src.transfom import lambda_consume
+from src.transfom.lambda_consume import LambdaConsume
+
+
+class ReshardedKinesis:
+    """list_shards of a stream whose shard 0 was split into 1 and 2"""
+
+    def list_shards(self, **params):
+        return {"Shards": [
+            {"ShardId": "shardId-0", "SequenceNumberRange": {
+                "StartingSequenceNumber": "1", "EndingSequenceNumber": "100"}},
+            {"ShardId": "shardId-1", "ParentShardId": "shardId-0",
+             "SequenceNumberRange": {"StartingSequenceNumber": "101"}},
+            {"ShardId": "shardId-2", "ParentShardId": "shardId-0",
+             "SequenceNumberRange": {"StartingSequenceNumber": "102"}},
+        ]}
+
+
+@pytest.fixture
+def make_consumer(consumer_env, monkeypatch):
+    def make(iterator_type):
+        monkeypatch.setenv("SHARD_ITERATOR_TYPE", iterator_type)
+        consumer = LambdaConsume()
+        consumer.started = []
+
+        def read_shard(kinesis, shard_id, iterator_type):
+            consumer.started.append((shard_id, iterator_type))
+        monkeypatch.setattr(consumer, "read_shard", read_shard)
+        return consumer
+    return make
+
+
+def start(consumer, workers, initial):
+    consumer.start_shard_workers(ReshardedKinesis(), workers, initial)
+    for worker in workers.values():
+        worker.join()
+
+
+def test_trim_horizon_reads_closed_parent_before_children(make_consumer):
+    consumer = make_consumer("TRIM_HORIZON")
+    workers = {}
+    start(consumer, workers, initial=True)
+    assert consumer.started == [("shardId-0", "TRIM_HORIZON")]
+
+    # The parent reader reached the end of the closed shard
+    consumer._finished_shards.add("shardId-0")
+    start(consumer, workers, initial=False)
+    assert consumer.started[1:] == [("shardId-1", "TRIM_HORIZON"), ("shardId-2", "TRIM_HORIZON")]
+
+
+def test_latest_skips_closed_parent(make_consumer):
+    consumer = make_consumer("LATEST")
+    start(consumer, {}, initial=True)
+    assert consumer.started == [("shardId-1", "LATEST"), ("shardId-2", "LATEST")]
+
+
+def test_checkpointed_parent_is_not_read_again(make_consumer, monkeypatch):
+    consumer = make_consumer("TRIM_HORIZON")
+    monkeypatch.setattr(consumer, "get_position", lambda shard_id: "100" if shard_id == "shardId-0" else None)
+    start(consumer, {}, initial=True)
+    assert consumer.started == [("shardId-1", "TRIM_HORIZON"), ("shardId-2", "TRIM_HORIZON")]
+
+
+def test_failed_first_discovery_releases_resources(make_consumer, monkeypatch):
+    monkeypatch.setenv("CHECKPOINT_BACKEND", "sqlite")
+    consumer = make_consumer("TRIM_HORIZON")
+
+    class UnreachableKinesis:
+        def list_shards(self, **params):
+            raise ConnectionError("stream unreachable")
+
+    monkeypatch.setattr(lambda_consume, "get_client", lambda *args, **kwargs: UnreachableKinesis())
+    with pytest.raises(ConnectionError):
+        consumer.stream_kinesis_records()
+    with pytest.raises(sqlite3.ProgrammingError):
+        consumer.checkpoint_store.get_checkpoint("shardId-0")
@@ -0,0 +1,75 @@
+import json
+import time
+
+import pytest
+
+from src.kinesis.topic_creator import TopicCreator
+
+
+@pytest.fixture
+def make_creator(monkeypatch, tmp_path):
+    """TopicCreator with LIMIT 3, a hysteresis of 2 and a cache in tmp_path"""
+    monkeypatch.setattr(TopicCreator, "TOPCOIN", [])
+    monkeypatch.setenv("LIMIT", "3")
+    monkeypatch.setenv("TOPCOIN_HYSTERESIS", "2")
+    monkeypatch.setenv("TOPCOIN_CACHE_PATH", str(tmp_path / "topcoin_cache.json"))
+    monkeypatch.setenv("TOPCOIN_CACHE_TTL", "3600")
+
+    def make(ranking):
+        rankings = [ranking]
+        monkeypatch.setattr(TopicCreator, "fetch_ranking", lambda self: rankings[-1])
+        creator = TopicCreator()
+        creator.rankings = rankings
+        return creator
+    return make
+
+
+def test_first_run_takes_the_top_limit(make_creator):
+    make_creator(["a", "b", "c", "d", "e"])
+    assert TopicCreator.TOPCOIN == ["a", "b", "c"]
+
+
+def test_select_keeps_incumbents_inside_the_band(make_creator):
+    creator = make_creator(["a", "b", "c"])
+    # c dropped to 4th, d is one place ahead of it: not enough to replace it
+    assert creator.select(["a", "b", "d", "c", "e"], ["a", "b", "c"]) == ["a", "b", "c"]
+    # d outranks c by three places
+    assert creator.select(["d", "a", "b", "c", "e"], ["a", "b", "c"]) == ["a", "b", "d"]
+    # c left the band altogether
+    assert creator.select(["a", "b", "d", "e", "f"], ["a", "b", "c"]) == ["a", "b", "d"]
+
+
+def test_refresh_notifies_listeners_and_writes_the_cache(make_creator):
+    creator = make_creator(["a", "b", "c"])
+    changes = []
+    creator.add_listener(lambda added, removed: changes.append((added, removed)))
+
+    creator.rankings.append(["d", "a", "b", "c", "e"])
+    assert creator.get_top_coins()
+    assert TopicCreator.TOPCOIN == ["a", "b", "d"]
+    assert changes == [(["d"], ["c"])]
+    with open(creator.TOPCOIN_CACHE_PATH) as f:
+        assert json.load(f)["symbols"] == ["a", "b", "d"]
+
+    # Same list again: no notification
+    assert creator.get_top_coins()
+    assert len(changes) == 1
+
+
+def test_fresh_cache_skips_the_ranking_request(make_creator, monkeypatch, tmp_path):
+    with open(tmp_path / "topcoin_cache.json", "w") as f:
+        json.dump({"fetched_at": time.time(), "limit": 3, "symbols": ["x", "y", "z"]}, f)
+
+    def unreachable(self):
+        raise AssertionError("the ranking endpoint must not be called")
+    monkeypatch.setattr(TopicCreator, "fetch_ranking", unreachable)
+    creator = TopicCreator()
+    assert TopicCreator.TOPCOIN == ["x", "y", "z"]
+    assert not creator._stale
+
+
+def test_cache_of_another_limit_is_ignored(make_creator, tmp_path):
+    with open(tmp_path / "topcoin_cache.json", "w") as f:
+        json.dump({"fetched_at": time.time(), "limit": 10, "symbols": ["x"]}, f)
+    make_creator(["a", "b", "c"])
+    assert TopicCreator.TOPCOIN == ["a", "b", "c"]
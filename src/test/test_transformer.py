@@ -0,0 +1,50 @@
+import json
+
+import pyarrow as pa
+
+from src.transfom.transformer import Transformer
+
+
+DEPTH_UPDATE = json.dumps({
+    "e": "depthUpdate", "E": 1700000000000, "s": "BTCUSDT", "U": 1, "u": 2,
+    "b": [["100.00", "1.0"]], "a": [["100.01", "2.0"]],
+}).encode("utf-8")
+
+
+def test_arrow_path_types_the_batch(ticker):
+    table = Transformer().transform_payloads_arrow([ticker(0), ticker(1)])
+    assert table.schema == Transformer.TICKER_SCHEMA
+    assert table.column("first_trade_id").to_pylist() == [1000, 1001]
+
+
+def test_double_encoded_payloads_are_unwrapped(ticker):
+    transformer = Transformer()
+    legacy = json.dumps(ticker(0).decode("utf-8")).encode("utf-8")
+    assert transformer.transform_payloads_arrow([legacy]).equals(
+        transformer.transform_payloads_arrow([ticker(0)]))
+
+
+def test_type_conflict_falls_back_to_pandas(ticker):
+    # A number where the raw schema expects a string fails read_json itself
+    table = Transformer().transform_payloads_arrow([ticker(0), ticker(1, c=100.5)])
+    assert table.schema == Transformer.TICKER_SCHEMA
+    assert table.column("last_price").to_pylist() == [100.0, 100.5]
+
+
+def test_other_event_types_and_garbage_are_dropped(ticker):
+    transformer = Transformer()
+    table = transformer.transform_payloads_arrow(
+        [ticker(0), DEPTH_UPDATE, b"not json", b'"broken', ticker(1)])
+    assert table.schema == Transformer.TICKER_SCHEMA
+    assert table.column("first_trade_id").to_pylist() == [1000, 1001]
+
+    table = transformer.transform_payloads_arrow([DEPTH_UPDATE])
+    assert table.num_rows == 0 and table.schema == Transformer.TICKER_SCHEMA
+
+
+def test_pandas_tables_concatenate_with_arrow_tables(ticker):
+    transformer = Transformer()
+    pandas_table = transformer.ticker_table(transformer.transform_payloads([ticker(0)]))
+    assert pandas_table.schema.metadata is None
+    combined = pa.concat_tables([pandas_table, transformer.transform_payloads_arrow([ticker(1)])])
+    assert combined.num_rows == 2
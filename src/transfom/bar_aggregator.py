@@ -0,0 +1,189 @@
+import logging
+import threading
+import numpy as np
+import pyarrow as pa
+
+
+BAR_SCHEMA = pa.schema([
+    ("symbol", pa.string()),
+    ("bar_interval", pa.string()),
+    ("bar_start", pa.timestamp("ms")),
+    ("bar_end", pa.timestamp("ms")),
+    ("open", pa.float64()),
+    ("high", pa.float64()),
+    ("low", pa.float64()),
+    ("close", pa.float64()),
+    # Sum / weighted mean over sampled last_qty, not the full traded volume
+    ("sampled_volume", pa.float64()),
+    ("sampled_vwap", pa.float64()),
+    ("trade_count", pa.int64()),
+    ("event_count", pa.int64()),
+])
+
+UNIT_MS = {"s": 1000, "m": 60 * 1000, "h": 60 * 60 * 1000, "d": 24 * 60 * 60 * 1000}
+
+
+def parse_interval(value):
+    """"1m" -> 60000"""
+    return int(value[:-1]) * UNIT_MS[value[-1]]
+
+
+class BarRing:
+    """Open bars of one symbol and interval in fixed-size NumPy arrays.
+
+    A bar lives in slot (bar_start / interval) % slots; the ring holds just
+    enough slots to keep every bar still inside the watermark open.
+    """
+
+    def __init__(self, interval_ms, watermark_ms):
+        self.interval_ms = interval_ms
+        self.slots = -(-watermark_ms // interval_ms) + 2
+        self.start = np.full(self.slots, -1, dtype=np.int64)
+        self.open_ts = np.zeros(self.slots, dtype=np.int64)
+        self.close_ts = np.zeros(self.slots, dtype=np.int64)
+        self.min_trade_id = np.zeros(self.slots, dtype=np.int64)
+        self.max_trade_id = np.zeros(self.slots, dtype=np.int64)
+        self.count = np.zeros(self.slots, dtype=np.int64)
+        # open, high, low, close, volume, price * volume
+        self.values = np.zeros((self.slots, 6), dtype=np.float64)
+
+    def add(self, event_time, price, qty, trade_id):
+        start = event_time - event_time % self.interval_ms
+        slot = (start // self.interval_ms) % self.slots
+        values = self.values[slot]
+        if self.start[slot] != start:
+            self.start[slot] = start
+            self.open_ts[slot] = self.close_ts[slot] = event_time
+            self.min_trade_id[slot] = self.max_trade_id[slot] = trade_id
+            self.count[slot] = 0
+            values[:] = (price, price, price, price, 0.0, 0.0)
+        if event_time < self.open_ts[slot]:
+            self.open_ts[slot] = event_time
+            values[0] = price
+        if event_time >= self.close_ts[slot]:
+            self.close_ts[slot] = event_time
+            values[3] = price
+        values[1] = max(values[1], price)
+        values[2] = min(values[2], price)
+        values[4] += qty
+        values[5] += price * qty
+        self.min_trade_id[slot] = min(self.min_trade_id[slot], trade_id)
+        self.max_trade_id[slot] = max(self.max_trade_id[slot], trade_id)
+        self.count[slot] += 1
+
+    def close_until(self, horizon):
+        """Pop every bar that ends at or before `horizon` (epoch ms)"""
+        closed = []
+        for slot in np.flatnonzero((self.start >= 0) & (self.start + self.interval_ms <= horizon)):
+            open_, high, low, close, volume, pv = self.values[slot]
+            closed.append((
+                int(self.start[slot]), int(self.start[slot]) + self.interval_ms,
+                open_, high, low, close, volume,
+                pv / volume if volume else close,
+                int(self.max_trade_id[slot] - self.min_trade_id[slot]) + 1,
+                int(self.count[slot]),
+            ))
+            self.start[slot] = -1
+        return closed
+
+
+class BarAggregator:
+    """Incremental OHLCV bars per symbol for several intervals.
+
+    Events may arrive out of order by up to `watermark_ms`; a bar is emitted
+    once the newest event time of its symbol has passed its end plus the
+    watermark, and events for an already emitted bar are dropped as late.
+    For ticker input the price/qty/trade id are last_price, last_qty and
+    last_trade_id of conflated samples, so sampled_volume and sampled_vwap
+    only cover the last trade of each sample, not the traded volume.
+
+    Idle bars are closed against an event-time clock, the newest event time
+    seen for any symbol, so a backlog or a replay closes bars at the pace
+    of its own data rather than the wall clock.
+    """
+
+    def __init__(self, intervals, watermark_ms=2000, price_column="last_price",
+                 qty_column="last_qty", trade_id_column="last_trade_id"):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.intervals = [(name, parse_interval(name)) for name in intervals]
+        self.watermark_ms = watermark_ms
+        self.price_column = price_column
+        self.qty_column = qty_column
+        self.trade_id_column = trade_id_column
+        self._lock = threading.Lock()
+        # symbol -> [max event time, [BarRing per interval]]
+        self._symbols = {}
+        # Newest event time of any symbol (epoch ms)
+        self._clock = -1
+        self.late_events = 0
+
+    def _state(self, symbol):
+        state = self._symbols.get(symbol)
+        if state is None:
+            rings = [BarRing(interval_ms, self.watermark_ms)
+                     for _, interval_ms in self.intervals]
+            state = self._symbols[symbol] = [-1, rings]
+        return state
+
+    def update(self, table):
+        """Add a transformed batch and return the bars it closed"""
+        if not table.num_rows:
+            return BAR_SCHEMA.empty_table()
+        symbols = table.column("symbol").to_pylist()
+        times = table.column("event_time").cast(pa.int64()).to_numpy(zero_copy_only=False)
+        prices = table.column(self.price_column).to_numpy(zero_copy_only=False)
+        qtys = table.column(self.qty_column).to_numpy(zero_copy_only=False)
+        trade_ids = table.column(self.trade_id_column).to_numpy(zero_copy_only=False)
+
+        rows = []
+        with self._lock:
+            for i in np.argsort(times, kind="stable"):
+                state = self._state(symbols[i])
+                event_time = int(times[i])
+                if event_time > self._clock:
+                    self._clock = event_time
+                if event_time > state[0]:
+                    # Close first so the ring slot is free for the new bar
+                    state[0] = event_time
+                    rows += self._close(symbols[i], state, event_time - self.watermark_ms)
+                horizon = state[0] - self.watermark_ms
+                for (_, interval_ms), ring in zip(self.intervals, state[1]):
+                    start = event_time - event_time % interval_ms
+                    if start + interval_ms <= horizon:
+                        self.late_events += 1
+                        continue
+                    ring.add(event_time, prices[i], qtys[i], trade_ids[i])
+        return self._to_table(rows)
+
+    def close_idle(self, idle_ms):
+        """Emit bars of symbols `idle_ms` behind the newest event of any symbol.
+
+        Their event clock is moved forward, so anything arriving later for
+        those bars counts as late instead of reopening them.
+        """
+        rows = []
+        with self._lock:
+            if self._clock < 0:
+                return self._to_table(rows)
+            horizon = self._clock - idle_ms
+            for symbol, state in self._symbols.items():
+                if state[0] - self.watermark_ms < horizon:
+                    state[0] = horizon + self.watermark_ms
+                    rows += self._close(symbol, state, horizon)
+        return self._to_table(rows)
+
+    def _close(self, symbol, state, horizon):
+        rows = []
+        for (name, _), ring in zip(self.intervals, state[1]):
+            rows += [(symbol, name) + bar for bar in ring.close_until(horizon)]
+        return rows
+
+    @staticmethod
+    def _to_table(rows):
+        if not rows:
+            return BAR_SCHEMA.empty_table()
+        columns = list(zip(*rows))
+        return pa.Table.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, BAR_SCHEMA)],
+            schema=BAR_SCHEMA,
+        )
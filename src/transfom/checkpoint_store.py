@@ -0,0 +1,109 @@
+import abc
+import logging
+import sqlite3
+import threading
+import time
+
+
+class CheckpointStore(abc.ABC):
+    """Last committed sequence number per shard.
+
+    A checkpoint is written only after the records up to that sequence
+    number are safely in S3, so a restart resumes with AFTER_SEQUENCE_NUMBER
+    instead of replaying the stream.
+    """
+
+    def __init__(self, stream_name):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.stream_name = stream_name
+
+    @abc.abstractmethod
+    def get_checkpoint(self, shard_id):
+        """Committed sequence number of the shard, None if there is none"""
+
+    @abc.abstractmethod
+    def set_checkpoint(self, shard_id, sequence_number):
+        """Commit the shard position"""
+
+    def close(self):
+        pass
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    def __init__(self, stream_name, path):
+        super().__init__(stream_name)
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    stream_name TEXT NOT NULL,
+                    shard_id TEXT NOT NULL,
+                    sequence_number TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (stream_name, shard_id)
+                )
+                """
+            )
+
+    def get_checkpoint(self, shard_id):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT sequence_number FROM checkpoints WHERE stream_name = ? AND shard_id = ?",
+                (self.stream_name, shard_id),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_checkpoint(self, shard_id, sequence_number):
+        with self._lock, self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO checkpoints (stream_name, shard_id, sequence_number, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (stream_name, shard_id)
+                DO UPDATE SET sequence_number = excluded.sequence_number,
+                              updated_at = excluded.updated_at
+                """,
+                (self.stream_name, shard_id, sequence_number, time.time()),
+            )
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class DynamoDBCheckpointStore(CheckpointStore):
+    """Checkpoints in a DynamoDB table keyed by (stream_name, shard_id).
+
+    Works against DynamoDB or any compatible endpoint such as DynamoDB Local.
+    """
+
+    def __init__(self, stream_name, table_name, client):
+        super().__init__(stream_name)
+        self.table_name = table_name
+        self.client = client
+
+    def get_checkpoint(self, shard_id):
+        response = self.client.get_item(
+            TableName=self.table_name,
+            Key={
+                "stream_name": {"S": self.stream_name},
+                "shard_id": {"S": shard_id},
+            },
+            ConsistentRead=True,
+        )
+        item = response.get("Item")
+        return item["sequence_number"]["S"] if item else None
+
+    def set_checkpoint(self, shard_id, sequence_number):
+        self.client.put_item(
+            TableName=self.table_name,
+            Item={
+                "stream_name": {"S": self.stream_name},
+                "shard_id": {"S": shard_id},
+                "sequence_number": {"S": sequence_number},
+                "updated_at": {"N": str(time.time())},
+            },
+        )
@@ -0,0 +1,113 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.kinesis.record_codec import decode_record
+from src.transfom.transformer import Transformer
+from src.transfom.event_types import EVENT_TYPES
+
+# One Transformer per worker process, built by the pool initializer
+_transformer = None
+
+
+def _init_worker():
+    global _transformer
+    logging.disable(logging.INFO)
+    _transformer = Transformer()
+
+
+def _to_shared_memory(buffer):
+    """Copy an Arrow buffer into a new segment, return (name, size)"""
+    shm = SharedMemory(create=True, size=max(1, buffer.size))
+    try:
+        shm.buf[:buffer.size] = memoryview(buffer).cast("B")
+    except Exception:
+        shm.close()
+        shm.unlink()
+        raise
+    shm.close()
+    return shm.name, buffer.size
+
+
+def _from_shared_memory(name, size):
+    """Read and release a segment made by _to_shared_memory"""
+    shm = SharedMemory(name=name)
+    try:
+        return bytes(shm.buf[:size])
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _table_to_ipc(table):
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def _decode(records, events=()):
+    payloads = [payload for data in records for payload in decode_record(data)]
+    if not events:
+        return _to_shared_memory(_table_to_ipc(_transformer.transform_payloads_arrow(payloads)))
+    tables = _transformer.transform_events(payloads, [EVENT_TYPES[event] for event in events])
+    # One segment per event type
+    return {event: _to_shared_memory(_table_to_ipc(table)) for event, table in tables.items()}
+
+
+def _encode_parquet(name, size, options):
+    table = pa.ipc.open_stream(pa.py_buffer(_from_shared_memory(name, size))).read_all()
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink, **options)
+    return _to_shared_memory(sink.getvalue())
+
+
+class DecodePool:
+    """Worker processes for the CPU-bound halves of the consumer.
+
+    `submit_decode` turns raw Kinesis record data into a ticker table, or
+    one table per event type when `events` are given, and
+    `submit_encode` a table into Parquet bytes. Results come back as Arrow
+    IPC or Parquet bytes in a shared-memory segment instead of being pickled
+    through the result pipe; the parent copies it out once and unlinks it.
+    Futures resolve in any order, callers keep their own order.
+    """
+
+    def __init__(self, workers):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.workers = workers
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+        )
+        self.logger.info(f"🚀 Started {workers} decode/encode worker processes")
+
+    def submit_decode(self, records, events=()):
+        """`records`: list of Kinesis record Data bytes, `events`: EventType names"""
+        return self._pool.submit(_decode, records, tuple(events))
+
+    def submit_encode(self, table, **options):
+        name, size = _to_shared_memory(_table_to_ipc(table))
+        return self._pool.submit(_encode_parquet, name, size, options)
+
+    @staticmethod
+    def table(future):
+        return pa.ipc.open_stream(pa.py_buffer(_from_shared_memory(*future.result()))).read_all()
+
+    @staticmethod
+    def tables(future):
+        """Result of a submit_decode with `events` -> {event: table}"""
+        return {
+            event: pa.ipc.open_stream(pa.py_buffer(_from_shared_memory(*segment))).read_all()
+            for event, segment in future.result().items()
+        }
+
+    @staticmethod
+    def data(future):
+        return _from_shared_memory(*future.result())
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,155 @@
+import logging
+import math
+import threading
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from src.metrics import REGISTRY
+
+
+def _mix(values):
+    """splitmix64 finalizer over a uint64 array"""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over uint64 keys, vectorized with NumPy"""
+
+    def __init__(self, capacity, fp_rate):
+        self.bits = max(64, int(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.array = np.zeros((self.bits + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, keys):
+        # Double hashing: h1 + i * h2 for i in range(hashes)
+        h1 = _mix(keys)
+        h2 = _mix(keys ^ np.uint64(0x9E3779B97F4A7C15)) | np.uint64(1)
+        steps = np.arange(self.hashes, dtype=np.uint64)
+        return (h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(self.bits)
+
+    def contains(self, keys):
+        positions = self._positions(keys)
+        bits = (self.array[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return bits.all(axis=1)
+
+    def add(self, keys):
+        positions = self._positions(keys)
+        np.bitwise_or.at(
+            self.array, positions >> np.uint64(3),
+            np.left_shift(1, (positions & np.uint64(7)).astype(np.uint8)).astype(np.uint8))
+
+
+class Deduplicator:
+    """Drops rows already seen, keyed on (symbol, event_time, id column).
+
+    A row newer than the high-water mark of its symbol cannot have been seen
+    and skips the filter, so an in-order stream never pays for (or suffers)
+    false positives. Older rows are checked against one Bloom filter per
+    `bucket_ms` of event time; buckets older than `retention_ms` behind the
+    newest event are dropped, which bounds memory. Rows older than the
+    retention pass through unchecked and are counted.
+    """
+
+    def __init__(self, retention_ms=600000, bucket_ms=60000, bucket_capacity=100000,
+                 fp_rate=0.001, symbol_column="symbol", time_column="event_time",
+                 id_column="last_trade_id"):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.retention_ms = retention_ms
+        self.bucket_ms = bucket_ms
+        self.bucket_capacity = bucket_capacity
+        self.fp_rate = fp_rate
+        self.symbol_column = symbol_column
+        self.time_column = time_column
+        self.id_column = id_column
+        self._lock = threading.Lock()
+        # symbol -> newest event time kept (epoch ms)
+        self._high_water = {}
+        # bucket index -> BloomFilter
+        self._buckets = {}
+        self._newest = None
+        self.stats = {"rows": 0, "duplicates": 0, "unchecked": 0}
+        self.duplicates = REGISTRY.counter(
+            "consumer_dedup_hits_total", "Rows dropped as duplicates")
+        self.unchecked = REGISTRY.counter(
+            "consumer_dedup_unchecked_total", "Rows older than the dedup retention")
+
+    def _keys(self, symbols, times, ids):
+        # Hash each distinct symbol once, rows index into the dictionary
+        encoded = pc.dictionary_encode(symbols).combine_chunks()
+        names = encoded.dictionary.to_pylist()
+        symbol_hashes = np.array(
+            [hash(symbol) & 0xFFFFFFFFFFFFFFFF for symbol in names], dtype=np.uint64)
+        indices = encoded.indices.to_numpy(zero_copy_only=False)
+        keys = symbol_hashes[indices]
+        keys = _mix(keys ^ times.astype(np.uint64))
+        keys = _mix(keys ^ ids.astype(np.uint64))
+        return keys, names, indices
+
+    def filter(self, table):
+        """Return `table` without the rows seen before"""
+        if not table.num_rows:
+            return table
+        times = table.column(self.time_column).cast(pa.int64()).to_numpy(zero_copy_only=False)
+        ids = table.column(self.id_column).fill_null(0).to_numpy(zero_copy_only=False)
+        keys, symbols, indices = self._keys(table.column(self.symbol_column), times, ids)
+
+        # First occurrence inside the batch
+        keep = np.zeros(len(keys), dtype=bool)
+        keep[np.unique(keys, return_index=True)[1]] = True
+
+        with self._lock:
+            high_water = np.array(
+                [self._high_water.get(symbol, -1) for symbol in symbols], dtype=np.int64)
+            newest = max(int(times.max()), self._newest or 0)
+            oldest_bucket = (newest - self.retention_ms) // self.bucket_ms
+            buckets = times // self.bucket_ms
+
+            # Only rows at or below their symbol's high-water mark can repeat
+            check = keep & (times <= high_water[indices])
+            unchecked = check & (buckets < oldest_bucket)
+            check &= ~unchecked
+            for bucket in np.unique(buckets[check]):
+                rows = np.flatnonzero(check & (buckets == bucket))
+                bloom = self._buckets.get(int(bucket))
+                if bloom is not None:
+                    keep[rows[bloom.contains(keys[rows])]] = False
+
+            for bucket in np.unique(buckets[keep & (buckets >= oldest_bucket)]):
+                rows = np.flatnonzero(keep & (buckets == bucket))
+                bloom = self._buckets.get(int(bucket))
+                if bloom is None:
+                    bloom = self._buckets[int(bucket)] = BloomFilter(
+                        self.bucket_capacity, self.fp_rate)
+                bloom.add(keys[rows])
+
+            kept_high = np.full(len(symbols), -1, dtype=np.int64)
+            np.maximum.at(kept_high, indices[keep], times[keep])
+            for symbol, value, current in zip(symbols, kept_high, high_water):
+                if value > current:
+                    self._high_water[symbol] = int(value)
+
+            self._newest = newest
+            for bucket in [b for b in self._buckets if b < oldest_bucket]:
+                del self._buckets[bucket]
+
+            duplicates = len(keys) - int(keep.sum())
+            self.stats["rows"] += len(keys)
+            self.stats["duplicates"] += duplicates
+            self.stats["unchecked"] += int(unchecked.sum())
+        self.duplicates.inc(duplicates)
+        self.unchecked.inc(int(unchecked.sum()))
+
+        if not duplicates:
+            return table
+        return table.filter(pa.array(keep))
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["buckets"] = len(self._buckets)
+            stats["bytes"] = sum(bloom.array.nbytes for bloom in self._buckets.values())
+        return stats
@@ -0,0 +1,74 @@
+import random
+import time
+
+
+class FetchScheduler:
+    """Chooses the Limit of each get_records call on one shard and the wait
+    before the next one.
+
+    While the reader is behind (MillisBehindLatest above `behind_ms`, or a
+    full batch came back) the limit doubles up to `max_limit` and calls go
+    back-to-back, spaced only by the 5 calls/second shard limit. Once caught
+    up the limit shrinks back to `min_limit` and empty polls back off from
+    `idle_delay` to `max_idle_delay`. Throttling backs off exponentially with
+    full jitter.
+    """
+
+    # Kinesis GetRecords limits per shard
+    MAX_LIMIT = 10000
+    MIN_INTERVAL = 0.2
+
+    def __init__(self, min_limit=100, max_limit=10000, idle_delay=1.0, max_idle_delay=5.0,
+                 behind_ms=1000, throttle_backoff=0.5, max_throttle_backoff=10.0,
+                 adaptive=True):
+        self.min_limit = max(1, min(min_limit, self.MAX_LIMIT))
+        self.max_limit = max(self.min_limit, min(max_limit, self.MAX_LIMIT))
+        self.idle_delay = idle_delay
+        self.max_idle_delay = max(idle_delay, max_idle_delay)
+        self.behind_ms = behind_ms
+        self.throttle_backoff = throttle_backoff
+        self.max_throttle_backoff = max_throttle_backoff
+        self.adaptive = adaptive
+
+        self.limit = self.min_limit
+        self._delay = idle_delay
+        self._throttles = 0
+        self._last_fetch = None
+
+    def before_fetch(self):
+        """Return the Limit for the call about to be made"""
+        self._last_fetch = time.monotonic()
+        return self.limit
+
+    def _spacing(self):
+        # Time left before the next call is allowed by the per-shard TPS limit
+        if self._last_fetch is None:
+            return 0.0
+        return max(0.0, self.MIN_INTERVAL - (time.monotonic() - self._last_fetch))
+
+    def after_fetch(self, count, millis_behind=0):
+        """Update from a get_records response, return seconds to wait"""
+        self._throttles = 0
+        if not self.adaptive:
+            return self.idle_delay
+
+        if millis_behind > self.behind_ms or count >= self.limit:
+            self.limit = min(self.max_limit, self.limit * 2)
+            self._delay = self.idle_delay
+            return self._spacing()
+
+        self.limit = max(self.min_limit, self.limit // 2)
+        if count:
+            self._delay = self.idle_delay
+            return max(self.idle_delay, self._spacing())
+        delay = self._delay
+        self._delay = min(self.max_idle_delay, self._delay * 2)
+        return max(delay, self._spacing())
+
+    def throttled(self):
+        """ProvisionedThroughputExceeded: shrink the limit, return the wait"""
+        self._throttles += 1
+        self.limit = max(self.min_limit, self.limit // 2)
+        cap = min(self.max_throttle_backoff,
+                  self.throttle_backoff * 2 ** (self._throttles - 1))
+        return max(random.uniform(0, cap), self._spacing())
@@ -1,12 +1,30 @@
 import base64
-import boto3
+import collections
+import functools
 import time
 import logging
 import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
 from dotenv import load_dotenv
+from src.aws_clients import get_client
 from src.transfom.transformer import Transformer
-import io
+from src.transfom.checkpoint_store import SQLiteCheckpointStore, DynamoDBCheckpointStore
+from src.transfom.parquet_buffer import ParquetBuffer
+from src.transfom.parquet_compactor import ParquetCompactor
+from src.transfom.s3_uploader import S3Uploader
+from src.transfom.latest_snapshot import LatestSnapshot
+from src.transfom.bar_aggregator import BarAggregator
+from src.transfom.fetch_scheduler import FetchScheduler
+from src.kinesis.record_codec import decode_record
+from src.transfom.decode_pool import DecodePool
+from src.transfom.deduplicator import Deduplicator
+from src.transfom.event_types import TICKER_EVENT, event_types_for, parse_stream_types
+from src.metrics import REGISTRY
 import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
 
 load_dotenv()
@@ -22,88 +40,647 @@ class LambdaConsume:
         self.SHARD_ITERATOR_TYPE = os.getenv("SHARD_ITERATOR_TYPE")
         self.LAMBDA_FETCH_DELAY = int(os.getenv("LAMBDA_FETCH_DELAY", 1))
         self.LIMIT_RECORD = int(os.getenv("LIMIT_RECORD", "100"))
+        # Same list as the producer; trade, aggTrade, kline and depth each get
+        # their own table, buffer and S3 prefix next to the ticker
+        self.STREAM_TYPES = parse_stream_types(
+            os.getenv("STREAM_TYPES"), os.getenv("STREAM_TYPE") or "ticker")
+        # Grow the get_records limit and skip the delay while behind
+        self.FETCH_ADAPTIVE = os.getenv(
+            "FETCH_ADAPTIVE", "true").lower() == "true"
+        self.FETCH_MAX_LIMIT = int(os.getenv("FETCH_MAX_LIMIT", 10000))
+        self.FETCH_MAX_IDLE_DELAY = float(
+            os.getenv("FETCH_MAX_IDLE_DELAY", 5))
+        self.FETCH_BEHIND_THRESHOLD_MS = int(
+            os.getenv("FETCH_BEHIND_THRESHOLD_MS", 1000))
+        self.FETCH_THROTTLE_BACKOFF = float(
+            os.getenv("FETCH_THROTTLE_BACKOFF", 0.5))
+        self.SHARD_DISCOVERY_INTERVAL = int(
+            os.getenv("SHARD_DISCOVERY_INTERVAL", 30))
+        # "none", "sqlite" or "dynamodb"
+        self.CHECKPOINT_BACKEND = os.getenv(
+            "CHECKPOINT_BACKEND", "none").lower()
+        self.CHECKPOINT_PATH = os.getenv(
+            "CHECKPOINT_PATH", "kinesis_checkpoints.sqlite")
+        self.CHECKPOINT_TABLE = os.getenv(
+            "CHECKPOINT_TABLE", "kinesis_checkpoints")
+        self.BUFFER_MAX_ROWS = int(os.getenv("BUFFER_MAX_ROWS", 100000))
+        self.BUFFER_MAX_BYTES = int(
+            os.getenv("BUFFER_MAX_BYTES", 64 * 1024 * 1024))
+        self.BUFFER_MAX_AGE = int(os.getenv("BUFFER_MAX_AGE", 60))
+        self.ROW_GROUP_SIZE = int(os.getenv("ROW_GROUP_SIZE", 100000))
+        # Uploads in flight at once; the connection pool is sized to match
+        self.S3_UPLOAD_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", 8))
+        self.S3_MAX_POOL_CONNECTIONS = int(
+            os.getenv("S3_MAX_POOL_CONNECTIONS", 2 * self.S3_UPLOAD_CONCURRENCY))
+        self.S3_MULTIPART_THRESHOLD = int(
+            os.getenv("S3_MULTIPART_THRESHOLD", 64 * 1024 * 1024))
+        self.S3_MULTIPART_CHUNKSIZE = int(
+            os.getenv("S3_MULTIPART_CHUNKSIZE", 16 * 1024 * 1024))
+        # Threads that flush full buffers while readers keep fetching,
+        # 0 flushes on the reader thread
+        self.FLUSH_WORKERS = int(os.getenv("FLUSH_WORKERS", 2))
+        # Hive-style key layout, any of "symbol", "dt", "hour"; empty = flat
+        self.PARTITION_LAYOUT = [
+            name.strip() for name in os.getenv("PARTITION_LAYOUT", "dt,hour").split(",")
+            if name.strip()
+        ]
+        # 0 disables the background compactor
+        self.COMPACTION_INTERVAL = int(os.getenv("COMPACTION_INTERVAL", 0))
+        self.COMPACTION_SMALL_FILE_BYTES = int(
+            os.getenv("COMPACTION_SMALL_FILE_BYTES", 16 * 1024 * 1024))
+        self.COMPACTION_TARGET_BYTES = int(
+            os.getenv("COMPACTION_TARGET_BYTES", 128 * 1024 * 1024))
+        # Latest-row-per-symbol snapshot, 0 disables it
+        self.SNAPSHOT_INTERVAL = int(os.getenv("SNAPSHOT_INTERVAL", 30))
+        # OHLCV bar intervals, empty disables bar aggregation
+        self.BAR_INTERVALS = [
+            name.strip() for name in os.getenv("BAR_INTERVALS", "1m,5m,1h").split(",")
+            if name.strip()
+        ]
+        self.BAR_WATERMARK_MS = int(os.getenv("BAR_WATERMARK_MS", 2000))
+        # Event time behind the newest event after which a quiet symbol closes
+        self.BAR_IDLE_MS = int(os.getenv("BAR_IDLE_MS", 60000))
+        # "arrow": columnar fast path, "pandas": original DataFrame path
+        self.TRANSFORM_ENGINE = os.getenv("TRANSFORM_ENGINE", "arrow").lower()
+        # Worker processes for decode and Parquet encode, 0 keeps both in-process
+        self.DECODE_WORKERS = int(os.getenv("DECODE_WORKERS", 0))
+        # Batches a shard reader may have in the pool at once
+        self.DECODE_INFLIGHT = int(os.getenv("DECODE_INFLIGHT", 2))
+        # Drop rows already seen (retries, reconnects, restarts)
+        self.DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+        self.DEDUP_RETENTION_MS = int(os.getenv("DEDUP_RETENTION_MS", 600000))
+        self.DEDUP_BUCKET_MS = int(os.getenv("DEDUP_BUCKET_MS", 60000))
+        self.DEDUP_BUCKET_CAPACITY = int(
+            os.getenv("DEDUP_BUCKET_CAPACITY", 100000))
+        self.DEDUP_FP_RATE = float(os.getenv("DEDUP_FP_RATE", 0.001))
+        # Prometheus text endpoint and periodic summary log, 0 disables them
+        self.METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+        self.METRICS_LOG_INTERVAL = int(os.getenv("METRICS_LOG_INTERVAL", 0))
         self.transformer = Transformer()
-        self.s3 = boto3.client('s3', region_name=self.AWS_REGION)
+        self.s3 = get_client(
+            's3',
+            region_name=self.AWS_REGION,
+            config=Config(
+                max_pool_connections=self.S3_MAX_POOL_CONNECTIONS,
+                tcp_keepalive=True,
+            ),
+        )
         self.bucket = self.S3_BUCKET_NAME
         self.logger = logging.getLogger(self.__class__.__name__)
+        self._stop_event = threading.Event()
+        self._finished_shards = set()
+        # shard_id -> last sequence number handed to the buffer
+        self._shard_positions = {}
+        self._shard_iterator_types = {}
+        self.checkpoint_store = self.create_checkpoint_store()
+        self.uploader = S3Uploader(
+            self.s3,
+            self.bucket,
+            max_concurrency=self.S3_UPLOAD_CONCURRENCY,
+            multipart_threshold=self.S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=self.S3_MULTIPART_CHUNKSIZE,
+        )
+        self.flush_executor = None
+        if self.FLUSH_WORKERS > 0:
+            self.flush_executor = ThreadPoolExecutor(
+                max_workers=self.FLUSH_WORKERS, thread_name_prefix="ParquetFlush")
+        self.event_types = event_types_for(self.STREAM_TYPES)
+        # event -> {shard_id: sequence number flushed by that event's buffer}
+        self._flushed = {TICKER_EVENT: {}}
+        self._committed = {}
+        self._commit_lock = threading.Lock()
+        self.buffer = ParquetBuffer(
+            self.save_to_s3,
+            on_flushed=functools.partial(self.buffer_flushed, TICKER_EVENT),
+            max_rows=self.BUFFER_MAX_ROWS,
+            max_bytes=self.BUFFER_MAX_BYTES,
+            max_age=self.BUFFER_MAX_AGE,
+            executor=self.flush_executor,
+        )
+        self.compactor = None
+        if self.COMPACTION_INTERVAL > 0:
+            self.compactor = ParquetCompactor(
+                self.s3,
+                self.bucket,
+                self.PROJECT_NAME,
+                small_file_bytes=self.COMPACTION_SMALL_FILE_BYTES,
+                target_bytes=self.COMPACTION_TARGET_BYTES,
+                row_group_size=self.ROW_GROUP_SIZE,
+                uploader=self.uploader,
+            )
+        self.bars = None
+        self.bar_buffer = None
+        if self.BAR_INTERVALS:
+            self.bars = BarAggregator(
+                self.BAR_INTERVALS, watermark_ms=self.BAR_WATERMARK_MS)
+            self.bar_buffer = ParquetBuffer(
+                self.save_bars_to_s3,
+                max_rows=self.BUFFER_MAX_ROWS,
+                max_bytes=self.BUFFER_MAX_BYTES,
+                max_age=self.BUFFER_MAX_AGE,
+            )
+        self.snapshot = None
+        if self.SNAPSHOT_INTERVAL > 0:
+            self.snapshot = LatestSnapshot(self.SNAPSHOT_INTERVAL)
+        self.dedup = None
+        if self.DEDUP_ENABLED:
+            self.dedup = Deduplicator(
+                retention_ms=self.DEDUP_RETENTION_MS,
+                bucket_ms=self.DEDUP_BUCKET_MS,
+                bucket_capacity=self.DEDUP_BUCKET_CAPACITY,
+                fp_rate=self.DEDUP_FP_RATE,
+            )
+        # event -> ParquetBuffer / Deduplicator of the other stream types
+        self.stream_buffers = {}
+        self.stream_dedups = {}
+        for spec in self.event_types:
+            self._flushed[spec.event] = {}
+            self.stream_buffers[spec.event] = ParquetBuffer(
+                functools.partial(self.save_stream_to_s3, spec),
+                on_flushed=functools.partial(self.buffer_flushed, spec.event),
+                max_rows=self.buffer_setting("BUFFER_MAX_ROWS", spec, self.BUFFER_MAX_ROWS),
+                max_bytes=self.buffer_setting("BUFFER_MAX_BYTES", spec, self.BUFFER_MAX_BYTES),
+                max_age=self.buffer_setting("BUFFER_MAX_AGE", spec, self.BUFFER_MAX_AGE),
+                executor=self.flush_executor,
+            )
+            if self.DEDUP_ENABLED and spec.dedup_id is not None:
+                self.stream_dedups[spec.event] = Deduplicator(
+                    retention_ms=self.DEDUP_RETENTION_MS,
+                    bucket_ms=self.DEDUP_BUCKET_MS,
+                    bucket_capacity=self.DEDUP_BUCKET_CAPACITY,
+                    fp_rate=self.DEDUP_FP_RATE,
+                    time_column=spec.dedup_time,
+                    id_column=spec.dedup_id,
+                )
+        self.decode_pool = None
+        if self.DECODE_WORKERS > 0:
+            self.decode_pool = DecodePool(self.DECODE_WORKERS)
+        self.arrival_lag = REGISTRY.histogram(
+            "consumer_arrival_lag_seconds",
+            "Kinesis arrival to get_records, oldest record of each batch")
+        self.transform_latency = REGISTRY.histogram(
+            "consumer_transform_seconds", "Duration of one batch transform")
+        self.event_to_transform = REGISTRY.histogram(
+            "consumer_event_to_transform_seconds",
+            "Binance event time to transform done, oldest event of each batch")
+        self.event_to_s3 = REGISTRY.histogram(
+            "consumer_event_to_s3_seconds",
+            "Binance event time to S3 put done, oldest event of each flush")
+        self.s3_put_latency = REGISTRY.histogram(
+            "consumer_s3_put_seconds", "Duration of one S3 put_object")
+        self.s3_objects = REGISTRY.counter(
+            "consumer_s3_objects_total", "Parquet objects written to S3")
+        self.s3_bytes = REGISTRY.counter(
+            "consumer_s3_bytes_total", "Parquet bytes written to S3")
+
+    def create_checkpoint_store(self):
+        if self.CHECKPOINT_BACKEND == "sqlite":
+            return SQLiteCheckpointStore(self.STREAM_NAME, self.CHECKPOINT_PATH)
+        if self.CHECKPOINT_BACKEND == "dynamodb":
+            return DynamoDBCheckpointStore(
+                self.STREAM_NAME,
+                self.CHECKPOINT_TABLE,
+                get_client('dynamodb', region_name=self.AWS_REGION),
+            )
+        return None
+
+    def get_position(self, shard_id):
+        """Last read sequence number, from memory or the checkpoint store"""
+        position = self._shard_positions.get(shard_id)
+        if position is None and self.checkpoint_store is not None:
+            position = self.checkpoint_store.get_checkpoint(shard_id)
+        return position
+
+    @staticmethod
+    def buffer_setting(name, spec, default):
+        """Per-type threshold, e.g. BUFFER_MAX_ROWS_TRADE, else the shared one"""
+        return int(os.getenv(f"{name}_{spec.table.upper()}", default))
+
+    def commit_positions(self, positions):
+        """Called by the buffer only after the flushed rows are in S3"""
+        if self.checkpoint_store is not None:
+            for shard_id, sequence_number in positions.items():
+                self.checkpoint_store.set_checkpoint(shard_id, sequence_number)
+
+    def buffer_flushed(self, event, positions):
+        """Commit a shard position once every type's buffer is past it.
+
+        Every batch hands its position to all buffers, so the oldest position
+        flushed across them has all of its rows in S3.
+        """
+        with self._commit_lock:
+            self._flushed[event].update(positions)
+            committed = {}
+            for shard_id in positions:
+                flushed = [done.get(shard_id) for done in self._flushed.values()]
+                if None in flushed:
+                    continue
+                position = min(flushed, key=int)
+                if self._committed.get(shard_id) != position:
+                    committed[shard_id] = self._committed[shard_id] = position
+            self.commit_positions(committed)
+
+    def partition_table(self, table, layout, time_column="event_time"):
+        """Split a table into (partition_path, table) pairs per layout"""
+        if not layout:
+            return [("", table)]
+
+        parts = []
+        for name in layout:
+            if name == "dt":
+                values = pc.strftime(table.column(time_column), format="%Y-%m-%d")
+            elif name == "hour":
+                values = pc.strftime(table.column(time_column), format="%H")
+            else:
+                values = table.column(name)
+            parts.append(pc.binary_join_element_wise(f"{name}=", values, ""))
+        paths = pc.binary_join_element_wise(*parts, "/")
+
+        # Partition columns live in the key, not in the file
+        data = table.drop_columns(
+            [name for name in layout if name in table.column_names])
+        return [
+            (path, data.filter(pc.equal(paths, path)))
+            for path in pc.unique(paths).to_pylist()
+        ]
 
     def save_to_s3(self, df):
+        if isinstance(df, pa.Table):
+            table = df
+        else:
+            # Convert pandas DataFrame -> Arrow Table
+            table = pa.Table.from_pandas(df, preserve_index=False)
+
+        keys = self.save_partitioned(table, self.PROJECT_NAME, self.PARTITION_LAYOUT)
+        self.observe_event_lag(self.event_to_s3, table)
+        return keys
+
+    def save_stream_to_s3(self, spec, table):
+        keys = self.save_partitioned(
+            table, f"{self.PROJECT_NAME}_{spec.table}", self.PARTITION_LAYOUT)
+        self.observe_event_lag(self.event_to_s3, table)
+        return keys
+
+    def save_bars_to_s3(self, table):
+        return self.save_partitioned(
+            table, f"{self.PROJECT_NAME}_bars", ["bar_interval", "dt"], "bar_start")
+
+    def save_partitioned(self, table, root, layout, time_column="event_time"):
         timestamp = int(time.time())
-        key = f"{self.PROJECT_NAME}/{timestamp}.parquet"
-        buffer = io.BytesIO()
-        # Convert pandas DataFrame -> Arrow Table
-        table = pa.Table.from_pandas(df, preserve_index=False)
-
-        # Write Parquet with Athena-friendly settings
-        pq.write_table(
-            table,
-            buffer,
-            compression="snappy",
-            version="1.0",               # Parquet v1
-            coerce_timestamps="ms",      # Epoch ms
-            allow_truncated_timestamps=True
-        )
-        buffer.seek(0)
+        parts = []
+        for path, partition in self.partition_table(table, layout, time_column):
+            prefix = f"{root}/{path}" if path else root
+            # uuid keeps keys unique across flushes within the same second
+            parts.append((f"{prefix}/{timestamp}-{uuid.uuid4().hex}.parquet", partition))
+        if self.decode_pool is None:
+            encoded = ((key, self.encode_parquet(partition)) for key, partition in parts)
+        else:
+            # Encode every partition in parallel
+            futures = [
+                (key, self.decode_pool.submit_encode(partition, **self.parquet_options()))
+                for key, partition in parts
+            ]
+            encoded = ((key, self.decode_pool.data(future)) for key, future in futures)
+        # Each upload starts as soon as its partition is encoded; the flush
+        # returns, and commits its checkpoint, only once all of them are in S3
+        uploads = [self.uploader.submit(self.put_parquet, key, data) for key, data in encoded]
+        return [upload.result() for upload in uploads]
+
+    def parquet_options(self):
+        # Athena-friendly settings
+        return {
+            "compression": "snappy",
+            "version": "1.0",               # Parquet v1
+            "coerce_timestamps": "ms",      # Epoch ms
+            "allow_truncated_timestamps": True,
+            "row_group_size": self.ROW_GROUP_SIZE,
+        }
+
+    def encode_parquet(self, table):
+        # getvalue() wraps the written buffer, no copy
+        sink = pa.BufferOutputStream()
+        pq.write_table(table, sink, **self.parquet_options())
+        return sink.getvalue()
 
-        self.s3.put_object(Bucket=self.bucket, Key=key, Body=buffer.getvalue())
+    def write_parquet(self, table, key):
+        return self.put_parquet(key, self.encode_parquet(table))
+
+    def put_parquet(self, key, data):
+        start = time.monotonic()
+        self.uploader.upload(key, data)
+        self.s3_put_latency.observe(time.monotonic() - start)
+        self.s3_objects.inc()
+        self.s3_bytes.inc(len(data))
         return key
 
-    def handle_event(self, event):
+    def save_snapshot(self):
+        """Overwrite the latest-per-symbol snapshot object in place"""
+        table = self.snapshot.to_table()
+        if table is not None:
+            try:
+                key = self.write_parquet(
+                    table, f"{self.PROJECT_NAME}_latest/latest.parquet")
+            except Exception:
+                self.snapshot.mark_dirty()
+                raise
+            self.logger.info(f"✅ Saved snapshot of {table.num_rows} symbols to {key}")
+
+    @staticmethod
+    def observe_event_lag(histogram, table):
+        """Observe now minus the oldest event_time of `table`"""
+        if table.num_rows and "event_time" in table.column_names:
+            oldest = pc.min(table.column("event_time"))
+            if oldest.is_valid:
+                histogram.observe(max(0.0, time.time() - oldest.value / 1000))
+
+    def handle_event(self, event, shard_id=None, sequence_number=None):
         records = event.get('Records', [])
         if not records:
             self.logger.error(f"❌ No records found.")
             return
 
-        df = self.transformer.transform_data(records)
+        start = time.monotonic()
+        if self.event_types:
+            tables = self.transformer.transform_events(
+                [base64.b64decode(record['kinesis']['data']) for record in records],
+                self.event_types, self.TRANSFORM_ENGINE)
+            self.transform_latency.observe(time.monotonic() - start)
+            self.handle_tables(tables, shard_id, sequence_number)
+            return
+        if self.TRANSFORM_ENGINE == "pandas":
+            df = self.transformer.transform_data(records)
+        else:
+            df = self.transformer.transform_data_arrow(records)
 
-        s3_key = self.save_to_s3(df)
-        self.logger.info(f"✅Saved processed data to S3: {s3_key}")
+        if not isinstance(df, pa.Table):
+            df = self.transformer.ticker_table(df)
+        self.transform_latency.observe(time.monotonic() - start)
+        self.handle_table(df, shard_id, sequence_number)
 
-    def stream_kinesis_records(self):
-        kinesis = boto3.client('kinesis', region_name=self.AWS_REGION)
-
-        # Get latest active shard
-        shard_response = kinesis.describe_stream(StreamName=self.STREAM_NAME)
-        active_shard = [
-            s for s in shard_response['StreamDescription']['Shards']
-            if 'EndingSequenceNumber' not in s['SequenceNumberRange']
-        ][0]
-
-        # Initial shard iterator
-        response = kinesis.get_shard_iterator(
-            StreamName=self.STREAM_NAME,
-            ShardId=active_shard['ShardId'],
-            ShardIteratorType=self.SHARD_ITERATOR_TYPE
-        )
-        shard_iterator = response['ShardIterator']
+    def handle_table(self, df, shard_id=None, sequence_number=None):
+        """Feed a transformed batch to the snapshot, bars and S3 buffer"""
+        self.observe_event_lag(self.event_to_transform, df)
+        if self.dedup is not None:
+            df = self.dedup.filter(df)
+        if self.snapshot is not None:
+            self.snapshot.update(df)
+        if self.bars is not None:
+            self.bar_buffer.add(self.bars.update(df))
+        # Written to S3 once the buffer reaches its row/byte/age threshold
+        self.buffer.add(df, shard_id, sequence_number)
 
-        self.logger.info("🚀 Starting Kinesis stream...")
+    def handle_tables(self, tables, shard_id=None, sequence_number=None):
+        """Feed one batch split by event type, every buffer gets the position"""
+        self.handle_table(tables.pop(TICKER_EVENT), shard_id, sequence_number)
+        for event, table in tables.items():
+            self.observe_event_lag(self.event_to_transform, table)
+            dedup = self.stream_dedups.get(event)
+            if dedup is not None:
+                table = dedup.filter(table)
+            self.stream_buffers[event].add(table, shard_id, sequence_number)
 
+    def stop(self):
+        self._stop_event.set()
+
+    def list_shards(self, kinesis):
+        shards = []
+        params = {"StreamName": self.STREAM_NAME}
         while True:
-            records_response = kinesis.get_records(
-                ShardIterator=shard_iterator,
-                Limit=self.LIMIT_RECORD
-            )
+            response = kinesis.list_shards(**params)
+            shards.extend(response["Shards"])
+            next_token = response.get("NextToken")
+            if not next_token:
+                return shards
+            params = {"NextToken": next_token}
+
+    def get_shard_iterator(self, kinesis, shard_id, iterator_type, sequence_number=None):
+        params = {
+            "StreamName": self.STREAM_NAME,
+            "ShardId": shard_id,
+            "ShardIteratorType": iterator_type,
+        }
+        if sequence_number:
+            params["ShardIteratorType"] = "AFTER_SEQUENCE_NUMBER"
+            params["StartingSequenceNumber"] = sequence_number
+        return kinesis.get_shard_iterator(**params)['ShardIterator']
+
+    @staticmethod
+    def to_event(records):
+        # Aggregated records (KPL or framed) expand to their inner events
+        return {
+            "Records": [
+                {
+                    "kinesis": {
+                        "data": base64.b64encode(payload).decode('utf-8')
+                    }
+                }
+                for r in records
+                for payload in decode_record(r['Data'])
+            ]
+        }
+
+    def observe_fetch(self, shard_id, records, response):
+        labels = {"shard": shard_id}
+        REGISTRY.gauge(
+            "consumer_millis_behind_latest", "MillisBehindLatest of the last get_records",
+            labels).set(response.get('MillisBehindLatest', 0))
+        if records:
+            REGISTRY.counter(
+                "consumer_records_total", "Records read from Kinesis", labels).inc(len(records))
+            arrival = records[0].get('ApproximateArrivalTimestamp')
+            if arrival is not None:
+                self.arrival_lag.observe(max(0.0, time.time() - arrival.timestamp()))
+
+    def create_fetch_scheduler(self):
+        return FetchScheduler(
+            min_limit=self.LIMIT_RECORD,
+            max_limit=self.FETCH_MAX_LIMIT,
+            idle_delay=self.LAMBDA_FETCH_DELAY,
+            max_idle_delay=self.FETCH_MAX_IDLE_DELAY,
+            behind_ms=self.FETCH_BEHIND_THRESHOLD_MS,
+            throttle_backoff=self.FETCH_THROTTLE_BACKOFF,
+            adaptive=self.FETCH_ADAPTIVE,
+        )
+
+    def handle_decoded(self, shard_id, future, sequence_number):
+        start = time.monotonic()
+        if self.event_types:
+            tables = self.decode_pool.tables(future)
+        else:
+            tables = {TICKER_EVENT: self.decode_pool.table(future)}
+        # Time the reader waited on the pool, the decode itself ran in parallel
+        self.transform_latency.observe(time.monotonic() - start)
+        self.handle_tables(tables, shard_id, sequence_number)
+        self._shard_positions[shard_id] = sequence_number
+
+    def read_shard(self, kinesis, shard_id, iterator_type):
+        """Consume one shard until it is closed or the consumer stops"""
+        position = self.get_position(shard_id)
+        shard_iterator = self.get_shard_iterator(
+            kinesis, shard_id, iterator_type, position)
+        if position:
+            self.logger.info(f"🚀 Resuming shard {shard_id} after {position}...")
+        else:
+            self.logger.info(f"🚀 Reading shard {shard_id}...")
+
+        scheduler = self.create_fetch_scheduler()
+        throttled = REGISTRY.counter(
+            "consumer_throttled_total", "get_records calls rejected for throughput",
+            {"shard": shard_id})
+        fetch_limit = REGISTRY.gauge(
+            "consumer_fetch_limit", "Limit of the last get_records call", {"shard": shard_id})
+        # (future, sequence number) of batches in the decode pool, oldest first
+        pending = collections.deque()
+        last_read = position
+        while shard_iterator and not self._stop_event.is_set():
+            try:
+                fetch_limit.set(scheduler.limit)
+                records_response = kinesis.get_records(
+                    ShardIterator=shard_iterator,
+                    Limit=scheduler.before_fetch()
+                )
+            except kinesis.exceptions.ExpiredIteratorException:
+                shard_iterator = self.get_shard_iterator(
+                    kinesis, shard_id, iterator_type, last_read)
+                continue
+            except kinesis.exceptions.ProvisionedThroughputExceededException:
+                throttled.inc()
+                self._stop_event.wait(scheduler.throttled())
+                continue
             records = records_response['Records']
-            # 🔁 update iterator
-            shard_iterator = records_response['NextShardIterator']
+            # 🔁 update iterator, None once a closed shard is drained
+            shard_iterator = records_response.get('NextShardIterator')
+            self.observe_fetch(shard_id, records, records_response)
 
             if records:
-                event = {
-                    "Records": [
-                        {
-                            "kinesis": {
-                                "data": base64.b64encode(r['Data']).decode('utf-8')
-                            }
-                        }
-                        for r in records
-                    ]
-                }
-                self.handle_event(event)
+                sequence_number = last_read = records[-1]['SequenceNumber']
+                if self.decode_pool is not None:
+                    pending.append((self.decode_pool.submit_decode(
+                        [r['Data'] for r in records],
+                        [spec.event for spec in self.event_types]), sequence_number))
+                else:
+                    self.handle_event(self.to_event(records),
+                                      shard_id, sequence_number)
+                    self._shard_positions[shard_id] = sequence_number
             else:
-                self.logger.info("⏳ No new records. Waiting...")
+                self.logger.info(f"⏳ No new records on {shard_id}. Waiting...")
+            # Results are taken in fetch order, so files keep shard order
+            while pending and (len(pending) > self.DECODE_INFLIGHT or pending[0][0].done()):
+                self.handle_decoded(shard_id, *pending.popleft())
+
+            delay = scheduler.after_fetch(
+                len(records), records_response.get('MillisBehindLatest', 0))
+            if delay:
+                self._stop_event.wait(delay)
+
+        while pending:
+            self.handle_decoded(shard_id, *pending.popleft())
+        if shard_iterator is None:
+            self._finished_shards.add(shard_id)
+            self.logger.info(f"✅ Shard {shard_id} is closed and fully consumed")
 
-            time.sleep(self.LAMBDA_FETCH_DELAY)
+    def start_shard_workers(self, kinesis, workers, initial):
+        """Start a reader for every shard that is ready to be consumed.
+
+        Children of a split or merge start only after their parents are
+        drained, so per-key ordering survives a reshard. At startup a closed
+        shard is skipped only once its checkpoint reached its end, or when
+        SHARD_ITERATOR_TYPE is LATEST; under TRIM_HORIZON its retained
+        records are read first.
+        """
+        shards = self.list_shards(kinesis)
+        listed = {shard['ShardId'] for shard in shards}
+        for shard in shards:
+            shard_id = shard['ShardId']
+            worker = workers.get(shard_id)
+            if shard_id in self._finished_shards or (worker and worker.is_alive()):
+                continue
+
+            ending = shard['SequenceNumberRange'].get('EndingSequenceNumber')
+            parents = [
+                parent for parent in (
+                    shard.get('ParentShardId'), shard.get('AdjacentParentShardId'))
+                if parent and parent in listed and parent not in self._finished_shards
+            ]
+            if worker is not None:
+                # Reader crashed, resume from its last sequence number
+                self.logger.warning(f"🔄 Restarting reader for {shard_id}")
+                iterator_type = self._shard_iterator_types[shard_id]
+            elif parents:
+                continue
+            elif initial:
+                position = self.get_position(shard_id)
+                if ending and (position == ending or (
+                        position is None and self.SHARD_ITERATOR_TYPE == "LATEST")):
+                    # Fully checkpointed, or LATEST would read nothing from it
+                    self._finished_shards.add(shard_id)
+                    continue
+                iterator_type = self.SHARD_ITERATOR_TYPE
+            else:
+                # New child shard after a reshard: read it from the start
+                iterator_type = "TRIM_HORIZON"
+
+            self._shard_iterator_types[shard_id] = iterator_type
+            workers[shard_id] = threading.Thread(
+                target=self.read_shard,
+                args=(kinesis, shard_id, iterator_type),
+                name=f"ShardReader-{shard_id}",
+                daemon=True,
+            )
+            workers[shard_id].start()
+
+    def stream_kinesis_records(self):
+        kinesis = get_client('kinesis', region_name=self.AWS_REGION)
+        workers = {}
+
+        self.logger.info("🚀 Starting Kinesis stream...")
+        REGISTRY.start(self.METRICS_PORT, self.METRICS_LOG_INTERVAL)
+        try:
+            # Inside the try: a failed first discovery still releases the
+            # executors, the uploader and the checkpoint store
+            self.start_shard_workers(kinesis, workers, initial=True)
+            if self.compactor is not None:
+                self.compactor.start(self.COMPACTION_INTERVAL)
+            last_discovery = time.monotonic()
+            while not self._stop_event.wait(1):
+                try:
+                    self.buffer.flush_if_due()
+                    for buffer in self.stream_buffers.values():
+                        buffer.flush_if_due()
+                    if self.snapshot is not None and self.snapshot.is_due():
+                        self.save_snapshot()
+                    if self.bars is not None:
+                        self.bar_buffer.add(self.bars.close_idle(self.BAR_IDLE_MS))
+                        self.bar_buffer.flush_if_due()
+                except Exception as e:
+                    # The failed flush stays buffered and is retried next tick
+                    self.logger.error(f"❌ Periodic flush failed: {e}")
+                # Rediscover shards to follow splits, merges and crashed readers
+                if time.monotonic() - last_discovery >= self.SHARD_DISCOVERY_INTERVAL:
+                    self.start_shard_workers(kinesis, workers, initial=False)
+                    last_discovery = time.monotonic()
+        finally:
+            self.stop()
+            for worker in workers.values():
+                worker.join()
+            if self.flush_executor is not None:
+                # Let flushes started by the readers finish first
+                self.flush_executor.shutdown(wait=True)
+            # Flush what is still buffered before exiting
+            self.buffer.flush()
+            for buffer in self.stream_buffers.values():
+                buffer.flush()
+            if self.snapshot is not None:
+                self.save_snapshot()
+            if self.bar_buffer is not None:
+                self.bar_buffer.flush()
+            if self.compactor is not None:
+                self.compactor.stop()
+            self.uploader.shutdown()
+            if self.decode_pool is not None:
+                self.decode_pool.shutdown()
+            if self.checkpoint_store is not None:
+                self.checkpoint_store.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,60 @@
+import logging
+import threading
+import time
+import pyarrow as pa
+
+
+class LatestSnapshot:
+    """Latest ticker row per symbol, maintained incrementally.
+
+    The consumer feeds every transformed batch through `update`; the
+    snapshot is small (one row per symbol) and is rewritten in place so
+    dashboards read kilobytes instead of the full history.
+    """
+
+    def __init__(self, interval=30):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.interval = interval
+        self._lock = threading.Lock()
+        # symbol -> (event_time_ms, one-row table)
+        self._rows = {}
+        self._dirty = False
+        self._last_write = time.monotonic()
+
+    def update(self, table):
+        if not table.num_rows:
+            return
+        symbols = table.column("symbol").to_pylist()
+        times = table.column("event_time").cast(pa.int64()).to_pylist()
+
+        best = {}
+        for i, (symbol, event_time) in enumerate(zip(symbols, times)):
+            if symbol not in best or event_time >= times[best[symbol]]:
+                best[symbol] = i
+        # take() copies the few winning rows, so the batch itself can be freed
+        latest = table.take(list(best.values()))
+
+        with self._lock:
+            for row, (symbol, i) in enumerate(best.items()):
+                current = self._rows.get(symbol)
+                if current is None or times[i] >= current[0]:
+                    self._rows[symbol] = (times[i], latest.slice(row, 1))
+                    self._dirty = True
+
+    def is_due(self):
+        with self._lock:
+            return self._dirty and time.monotonic() - self._last_write >= self.interval
+
+    def mark_dirty(self):
+        with self._lock:
+            self._dirty = True
+
+    def to_table(self):
+        """Return the snapshot and mark it clean, or None when unchanged"""
+        with self._lock:
+            if not self._dirty:
+                return None
+            self._dirty = False
+            self._last_write = time.monotonic()
+            rows = [row for _, row in self._rows.values()]
+        return pa.concat_tables(rows).combine_chunks()
@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+import pyarrow as pa
+
+
+class ParquetBuffer:
+    """Accumulates Arrow tables until a row, byte or age threshold is hit.
+
+    `writer(table)` persists a flushed table and returns its keys. Shard
+    positions added with each table are handed to `on_flushed(positions)`
+    only after the writer succeeded, so checkpoints never run ahead of S3.
+
+    With an `executor`, flushes triggered by `add` run there and the caller
+    goes back to reading; at most `max_pending` such flushes are in flight
+    before `add` waits for one to finish.
+    """
+
+    def __init__(self, writer, on_flushed=None, max_rows=100000,
+                 max_bytes=64 * 1024 * 1024, max_age=60, executor=None, max_pending=2):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.writer = writer
+        self.on_flushed = on_flushed
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.executor = executor
+        self._pending = threading.BoundedSemaphore(max_pending)
+
+        self._lock = threading.Lock()
+        # Flushes are serialized so checkpoints are committed in order
+        self._flush_lock = threading.Lock()
+        self._tables = []
+        self._rows = 0
+        self._bytes = 0
+        self._oldest = None
+        self._positions = {}
+
+    def add(self, table, shard_id=None, sequence_number=None):
+        with self._lock:
+            if table.num_rows:
+                if self._oldest is None:
+                    self._oldest = time.monotonic()
+                self._tables.append(table)
+                self._rows += table.num_rows
+                self._bytes += table.nbytes
+            if shard_id is not None and sequence_number is not None:
+                self._positions[shard_id] = sequence_number
+            full = self._rows >= self.max_rows or self._bytes >= self.max_bytes
+        if full:
+            if self.executor is None:
+                self.flush()
+            else:
+                self._pending.acquire()
+                self.executor.submit(self._background_flush)
+
+    def _background_flush(self):
+        try:
+            self.flush()
+        except Exception as e:
+            # Restored by flush, retried by the next flush_if_due
+            self.logger.error(f"❌ Background flush failed: {e}")
+        finally:
+            self._pending.release()
+
+    def is_due(self):
+        with self._lock:
+            if self._oldest is None:
+                # Positions of batches without rows, hand them on right away
+                return bool(self._positions)
+            return time.monotonic() - self._oldest >= self.max_age
+
+    def flush_if_due(self):
+        if self.is_due():
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                tables = self._tables
+                positions = self._positions
+                self._tables = []
+                self._rows = 0
+                self._bytes = 0
+                self._oldest = None
+                self._positions = {}
+
+            if tables:
+                try:
+                    table = pa.concat_tables(tables)
+                    keys = self.writer(table)
+                except Exception:
+                    self._restore(tables, positions)
+                    raise
+                self.logger.info(
+                    f"✅ Flushed {table.num_rows} rows from {len(tables)} batches to {keys}")
+            if positions and self.on_flushed is not None:
+                self.on_flushed(positions)
+
+    def _restore(self, tables, positions):
+        # Put a failed flush back in front so the next flush retries it
+        with self._lock:
+            self._tables = tables + self._tables
+            self._rows += sum(table.num_rows for table in tables)
+            self._bytes += sum(table.nbytes for table in tables)
+            self._oldest = time.monotonic() if self._oldest is None else self._oldest
+            for shard_id, sequence_number in positions.items():
+                self._positions.setdefault(shard_id, sequence_number)
@@ -0,0 +1,113 @@
+import io
+import logging
+import threading
+import time
+import uuid
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+class ParquetCompactor:
+    """Merges small Parquet objects under a prefix into large ones.
+
+    Small files are grouped per directory (so partitions stay intact),
+    rewritten as one object of up to `target_bytes`, and the sources are
+    deleted once the merged object is written. With an `uploader` (see
+    S3Uploader), large merged files are sent as multipart uploads.
+    """
+
+    def __init__(self, s3, bucket, prefix, small_file_bytes=16 * 1024 * 1024,
+                 target_bytes=128 * 1024 * 1024, row_group_size=100000, uploader=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.s3 = s3
+        self.bucket = bucket
+        # No prefix (PROJECT_NAME unset) scans the whole bucket
+        self.prefix = prefix.rstrip("/") + "/" if prefix else ""
+        self.small_file_bytes = small_file_bytes
+        self.target_bytes = target_bytes
+        self.row_group_size = row_group_size
+        self.uploader = uploader
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def list_small_files(self):
+        """Return {directory: [(key, size), ...]} of small Parquet objects"""
+        directories = {}
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get("Contents", []):
+                key = obj["Key"]
+                if key.endswith(".parquet") and obj["Size"] < self.small_file_bytes:
+                    directory = key.rsplit("/", 1)[0]
+                    directories.setdefault(directory, []).append((key, obj["Size"]))
+        return directories
+
+    def plan_groups(self, files):
+        groups = []
+        group, size = [], 0
+        for key, file_size in sorted(files):
+            if group and size + file_size > self.target_bytes:
+                groups.append(group)
+                group, size = [], 0
+            group.append(key)
+            size += file_size
+        if group:
+            groups.append(group)
+        return [group for group in groups if len(group) > 1]
+
+    def merge(self, directory, keys):
+        tables = []
+        for key in keys:
+            body = self.s3.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+            tables.append(pq.read_table(io.BytesIO(body)))
+        table = pa.concat_tables(tables, promote_options="default")
+
+        sink = pa.BufferOutputStream()
+        pq.write_table(
+            table,
+            sink,
+            compression="snappy",
+            version="1.0",
+            coerce_timestamps="ms",
+            allow_truncated_timestamps=True,
+            row_group_size=self.row_group_size,
+        )
+        key = f"{directory}/compacted-{int(time.time())}-{uuid.uuid4().hex}.parquet"
+        if self.uploader is not None:
+            self.uploader.upload(key, sink.getvalue())
+        else:
+            self.s3.put_object(Bucket=self.bucket, Key=key, Body=sink.getvalue().to_pybytes())
+
+        for i in range(0, len(keys), 1000):
+            self.s3.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": k} for k in keys[i:i + 1000]], "Quiet": True},
+            )
+        self.logger.info(f"🗜️ Compacted {len(keys)} files ({table.num_rows} rows) into {key}")
+        return key
+
+    def compact_once(self):
+        merged = 0
+        for directory, files in self.list_small_files().items():
+            for keys in self.plan_groups(files):
+                self.merge(directory, keys)
+                merged += len(keys)
+        return merged
+
+    def start(self, interval):
+        """Run compaction every `interval` seconds on a background thread"""
+        def loop():
+            while not self._stop_event.wait(interval):
+                try:
+                    self.compact_once()
+                except Exception as e:
+                    self.logger.error(f"❌ Compaction failed: {e}")
+
+        self._thread = threading.Thread(target=loop, name="ParquetCompactor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
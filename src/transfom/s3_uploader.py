@@ -0,0 +1,54 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow as pa
+from boto3.s3.transfer import TransferConfig
+
+
+class S3Uploader:
+    """Bounded pool of S3 uploads running beside the shard readers.
+
+    `submit` hands a job to one of `max_concurrency` upload threads and
+    blocks once `max_concurrency` more are queued, so a slow S3 pushes back
+    on the caller instead of piling up encoded files. `upload` sends an
+    encoded file without copying it: objects of `multipart_threshold` bytes
+    and more go through a streaming multipart upload.
+    """
+
+    def __init__(self, s3, bucket, max_concurrency=8, multipart_threshold=64 * 1024 * 1024,
+                 multipart_chunksize=16 * 1024 * 1024):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.s3 = s3
+        self.bucket = bucket
+        self.multipart_threshold = multipart_threshold
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=max_concurrency,
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="S3Upload")
+        self._slots = threading.BoundedSemaphore(max_concurrency * 2)
+
+    def upload(self, key, data):
+        """`data`: bytes or pyarrow Buffer of an encoded object"""
+        # Read-only file view over the buffer, boto3 streams from it
+        body = pa.BufferReader(data)
+        if len(data) >= self.multipart_threshold:
+            self.s3.upload_fileobj(body, self.bucket, key, Config=self.transfer_config)
+        else:
+            self.s3.put_object(Bucket=self.bucket, Key=key, Body=body)
+        return key
+
+    def submit(self, fn, *args):
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
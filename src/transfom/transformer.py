@@ -1,55 +1,213 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.json as paj
 import base64
 import json
 import logging
+from src.metrics import REGISTRY
+from src.transfom.event_types import TICKER_EVENT, decode_payload, route_payloads
 
 
 class Transformer:
+    COLUMN_MAP = {
+        "e": "event",
+        "E": "event_time",
+        "s": "symbol",
+        "p": "price_change",
+        "P": "price_change_percent",
+        "w": "weighted_avg_price",
+        "x": "prev_close_price",       # match Athena schema
+        "c": "last_price",
+        "Q": "last_qty",               # match Athena schema
+        "b": "best_bid_price",
+        "B": "best_bid_qty",           # match Athena schema
+        "a": "best_ask_price",
+        "A": "best_ask_qty",           # match Athena schema
+        "o": "open_price",
+        "h": "high_price",
+        "l": "low_price",
+        "v": "base_volume",
+        "q": "quote_volume",
+        "O": "open_time",
+        "C": "close_time",
+        "F": "first_trade_id",
+        "L": "last_trade_id",
+        "n": "trade_count"
+    }
+
+    FLOAT_COLUMNS = [
+        "price_change", "price_change_percent", "weighted_avg_price",
+        "prev_close_price", "last_price", "last_qty",
+        "best_bid_price", "best_bid_qty", "best_ask_price",
+        "best_ask_qty", "open_price", "high_price", "low_price",
+        "base_volume", "quote_volume"
+    ]
+    BIGINT_COLUMNS = ["first_trade_id", "last_trade_id", "trade_count"]
+    TIMESTAMP_COLUMNS = ["event_time", "open_time", "close_time"]
+
+    # Same columns and order as the Athena `ticker` table
+    TICKER_SCHEMA = pa.schema([
+        ("event", pa.string()),
+        ("event_time", pa.timestamp("ms")),
+        ("symbol", pa.string()),
+        ("price_change", pa.float64()),
+        ("price_change_percent", pa.float64()),
+        ("weighted_avg_price", pa.float64()),
+        ("prev_close_price", pa.float64()),
+        ("last_price", pa.float64()),
+        ("last_qty", pa.float64()),
+        ("best_bid_price", pa.float64()),
+        ("best_bid_qty", pa.float64()),
+        ("best_ask_price", pa.float64()),
+        ("best_ask_qty", pa.float64()),
+        ("open_price", pa.float64()),
+        ("high_price", pa.float64()),
+        ("low_price", pa.float64()),
+        ("base_volume", pa.float64()),
+        ("quote_volume", pa.float64()),
+        ("open_time", pa.timestamp("ms")),
+        ("close_time", pa.timestamp("ms")),
+        ("first_trade_id", pa.int64()),
+        ("last_trade_id", pa.int64()),
+        ("trade_count", pa.int64()),
+    ])
+
+    # Binance payload as it arrives: prices are JSON strings, times are epoch ms
+    RAW_TICKER_SCHEMA = pa.schema([
+        (key, pa.string() if pa.types.is_floating(field_type) or pa.types.is_string(field_type)
+         else pa.int64())
+        for key, field_type in zip(COLUMN_MAP, TICKER_SCHEMA.types)
+    ])
+
     def __init__(self):
         self.logger = logging.getLogger(self.__class__.__name__)
 
     def transform_data(self, records):
+        return self.transform_payloads(
+            [base64.b64decode(record['kinesis']['data']) for record in records])
+
+    def transform_payloads(self, payloads):
+        """pandas path over raw (not base64) record payloads"""
         rows = []
 
-        for record in records:
-            payload = base64.b64decode(record['kinesis']['data'])
-            data = json.loads(payload)
-            data = json.loads(payload)
-            if isinstance(data, str):
-                data = json.loads(data)  # parse again
+        skipped = 0
+        for payload in payloads:
+            try:
+                data = json.loads(decode_payload(payload))
+            except ValueError:
+                data = None
+            if not isinstance(data, dict):
+                skipped += 1
+                continue
             rows.append(data)
+        if skipped:
+            self.logger.warning(f"⚠️ Skipped {skipped} payloads that are not JSON objects")
 
         df = pd.DataFrame(rows)
         df.head(10)
         df = self.normalize_data(df)
         return df
 
+    def decode_payloads(self, records):
+        """Join the record payloads into newline-delimited JSON bytes."""
+        return self.join_payloads(
+            base64.b64decode(record['kinesis']['data']) for record in records)
+
+    def join_payloads(self, payloads):
+        return b"\n".join(decode_payload(payload) for payload in payloads)
+
+    def transform_data_arrow(self, records):
+        """Parse a batch straight into a typed Arrow table.
+
+        Schema-driven equivalent of `transform_data`, without per-row dicts
+        or pandas. Falls back to the pandas path when a record cannot be
+        parsed or cast.
+        """
+        return self.transform_payloads_arrow(
+            [base64.b64decode(record['kinesis']['data']) for record in records])
+
+    def transform_payloads_arrow(self, payloads):
+        """Arrow path over raw (not base64) record payloads"""
+        if not payloads:
+            return self.TICKER_SCHEMA.empty_table()
+
+        try:
+            raw = paj.read_json(
+                pa.BufferReader(self.join_payloads(payloads)),
+                parse_options=paj.ParseOptions(
+                    explicit_schema=self.RAW_TICKER_SCHEMA,
+                    unexpected_field_behavior="ignore",
+                ),
+            )
+            raw = raw.select(self.RAW_TICKER_SCHEMA.names).rename_columns(
+                self.TICKER_SCHEMA.names)
+
+            # Drop rows missing required columns
+            valid = pc.is_valid(raw.column(0))
+            for column in raw.columns[1:]:
+                valid = pc.and_(valid, pc.is_valid(column))
+            table = raw.filter(valid)
+            self.logger.info(
+                f"❌ ✅ Removed {raw.num_rows - table.num_rows} rows due to missing required columns")
+
+            columns = [
+                table.column(field.name).cast(field.type)
+                for field in self.TICKER_SCHEMA
+            ]
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            # Type conflicts and broken lines fail the whole batch in Arrow,
+            # the pandas path handles them row by row
+            self.logger.warning(f"⚠️ Arrow path failed ({e}), using pandas path")
+            return self.ticker_table(self.transform_payloads(payloads))
+        return pa.Table.from_arrays(columns, schema=self.TICKER_SCHEMA)
+
+    def ticker_table(self, df):
+        """Normalized DataFrame -> Arrow table with exactly TICKER_SCHEMA.
+
+        pandas may infer other types (large_string under pandas 3) and adds
+        its own metadata; either breaks `pa.concat_tables` with Arrow batches.
+        """
+        if any(name not in df.columns for name in self.TICKER_SCHEMA.names):
+            # A required column absent from every row, e.g. no ticker in the batch
+            return self.TICKER_SCHEMA.empty_table()
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        return table.select(self.TICKER_SCHEMA.names).replace_schema_metadata(None).cast(
+            self.TICKER_SCHEMA)
+
+    def transform_events(self, payloads, event_types, engine="arrow"):
+        """Route a mixed batch by its "e" field -> {event: Arrow table}.
+
+        Ticker rows take the usual path, every EventType in `event_types`
+        its own schema; each gets a table, empty if the batch had none.
+        Other events are dropped and counted.
+        """
+        groups = route_payloads(payloads)
+        ticker = groups.pop(TICKER_EVENT, [])
+        if not ticker:
+            table = self.TICKER_SCHEMA.empty_table()
+        elif engine == "pandas":
+            table = self.ticker_table(self.transform_payloads(ticker))
+        else:
+            table = self.transform_payloads_arrow(ticker)
+        tables = {TICKER_EVENT: table}
+        for spec in event_types:
+            lines = groups.pop(spec.event, [])
+            tables[spec.event] = spec.transform(b"\n".join(lines)) if lines else spec.schema.empty_table()
+        for event, lines in groups.items():
+            REGISTRY.counter(
+                "consumer_skipped_events_total", "Events of a type not ingested",
+                {"event": str(event)}).inc(len(lines))
+        return tables
+
+    def validate_arrow(self, records):
+        """Check that the Arrow and pandas paths produce the same table."""
+        expected = self.ticker_table(self.transform_data(records))
+        actual = self.transform_data_arrow(records)
+        return actual.equals(expected)
+
     def normalize_data(self, df):
-        column_map = {
-            "e": "event",
-            "E": "event_time",
-            "s": "symbol",
-            "p": "price_change",
-            "P": "price_change_percent",
-            "w": "weighted_avg_price",
-            "x": "prev_close_price",       # match Athena schema
-            "c": "last_price",
-            "Q": "last_qty",               # match Athena schema
-            "b": "best_bid_price",
-            "B": "best_bid_qty",           # match Athena schema
-            "a": "best_ask_price",
-            "A": "best_ask_qty",           # match Athena schema
-            "o": "open_price",
-            "h": "high_price",
-            "l": "low_price",
-            "v": "base_volume",
-            "q": "quote_volume",
-            "O": "open_time",
-            "C": "close_time",
-            "F": "first_trade_id",
-            "L": "last_trade_id",
-            "n": "trade_count"
-        }
+        column_map = self.COLUMN_MAP
 
         # Rename columns
         df.rename(columns=column_map, inplace=True)
@@ -65,27 +223,18 @@ class Transformer:
             f"❌ ✅ Removed {before_rows - after_rows} rows due to missing required columns")
 
         # Float columns
-        float_columns = [
-            "price_change", "price_change_percent", "weighted_avg_price",
-            "prev_close_price", "last_price", "last_qty",
-            "best_bid_price", "best_bid_qty", "best_ask_price",
-            "best_ask_qty", "open_price", "high_price", "low_price",
-            "base_volume", "quote_volume"
-        ]
-        for col in float_columns:
+        for col in self.FLOAT_COLUMNS:
             if col in df.columns:
                 df[col] = pd.to_numeric(df[col], errors="coerce")
 
         # Bigint columns
-        bigint_columns = ["first_trade_id", "last_trade_id", "trade_count"]
-        for col in bigint_columns:
+        for col in self.BIGINT_COLUMNS:
             if col in df.columns:
                 df[col] = pd.to_numeric(
                     df[col], errors="coerce").fillna(0).astype("int64")
 
         # Timestamp columns
-        timestamp_columns = ["event_time", "open_time", "close_time"]
-        for col in timestamp_columns:
+        for col in self.TIMESTAMP_COLUMNS:
             if col in df.columns:
                 df[col] = pd.to_datetime(
                     df[col], unit="ms", errors="coerce").astype("datetime64[ms]")